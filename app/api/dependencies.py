@@ -0,0 +1,62 @@
+"""
+API Dependencies
+Expose the service singletons created in the application lifespan
+"""
+
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from fastapi import Request
+
+from app.services import (
+    DocumentProcessor,
+    ChunkingService,
+    EmbeddingService,
+    BatchingEmbedder,
+    StorageService,
+    RAGService,
+    SearchBatcher
+)
+
+
+def get_doc_processor(request: Request) -> DocumentProcessor:
+    """Get the shared document processor"""
+    return request.app.state.doc_processor
+
+
+def get_chunking_service(request: Request) -> ChunkingService:
+    """Get the shared chunking service"""
+    return request.app.state.chunking_service
+
+
+def get_embedding_service(request: Request) -> EmbeddingService:
+    """Get the shared embedding service"""
+    return request.app.state.embedding_service
+
+
+def get_batching_embedder(request: Request) -> BatchingEmbedder:
+    """Get the shared batching embedder"""
+    return request.app.state.batching_embedder
+
+
+def get_storage_service(request: Request) -> StorageService:
+    """Get the shared storage service"""
+    return request.app.state.storage_service
+
+
+def get_rag_service(request: Request) -> RAGService:
+    """Get the shared RAG service"""
+    return request.app.state.rag_service
+
+
+def get_search_batcher(request: Request) -> SearchBatcher:
+    """Get the shared search batcher"""
+    return request.app.state.search_batcher
+
+
+def get_io_executor(request: Request) -> ThreadPoolExecutor:
+    """Get the shared worker thread pool for blocking calls"""
+    return request.app.state.io_executor
+
+
+def get_process_executor(request: Request) -> ProcessPoolExecutor:
+    """Get the shared worker process pool for CPU-bound parsing"""
+    return request.app.state.process_executor
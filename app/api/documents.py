@@ -4,83 +4,171 @@ Handles document upload, processing, and management
 """
 
 import os
-import shutil
-from typing import List
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import asyncio
+import hashlib
+import tempfile
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import List, Dict, Any, Optional, Tuple
+import aiofiles
+import numpy as np
+from fastapi import APIRouter, UploadFile, File, HTTPException, Depends
 from loguru import logger
+from sqlalchemy.exc import IntegrityError
 
-from app.models.schemas import DocumentUploadResponse, DocumentMetadata
+from app.models.schemas import DocumentUploadResponse, BatchUploadResponse, DocumentMetadata
 from app.services import (
     DocumentProcessor,
     ChunkingService,
-    EmbeddingService,
+    Chunk,
+    BatchingEmbedder,
     StorageService
 )
-from app.config import settings
+from app.models.document import Document
+from app.api.dependencies import (
+    get_doc_processor,
+    get_chunking_service,
+    get_batching_embedder,
+    get_storage_service,
+    get_io_executor,
+    get_process_executor
+)
+from app.config import Settings, get_settings
 
 router = APIRouter(prefix="/api/documents", tags=["documents"])
 
-# Initialize services
-doc_processor = DocumentProcessor()
-chunking_service = ChunkingService(
-    default_chunk_size=settings.default_chunk_size,
-    default_overlap=settings.default_chunk_overlap
-)
-embedding_service = EmbeddingService(model_name=settings.embedding_model)
-storage_service = StorageService()
+SUPPORTED_EXTENSIONS = ['.pdf', '.docx', '.doc', '.txt']
+UPLOAD_READ_SIZE = 1024 * 1024  # Stream uploads to disk in 1 MB pieces
 
-# Create upload directory
-os.makedirs(settings.upload_dir, exist_ok=True)
 
+async def run_blocking(executor: Executor, func, *args, **kwargs):
+    """Run a blocking call on a worker pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
 
-@router.post("/upload", response_model=DocumentUploadResponse)
-async def upload_document(file: UploadFile = File(...)):
+
+async def save_upload(file: UploadFile, settings: Settings) -> Tuple[str, str, str]:
     """
-    Upload and process a document
+    Stream an uploaded file to disk, enforcing the configured size limit
     
-    Supports: PDF, DOCX, DOC, TXT
+    The file is written under a unique name in the upload directory so the
+    client-supplied filename never becomes part of the path. A BLAKE2b
+    fingerprint of the content is computed while streaming.
+    
+    Args:
+        file: Uploaded file
+        settings: Settings providing upload_dir and max_file_size_mb
+        
+    Returns:
+        Tuple of (saved_file_path, sanitized_filename, content_hash)
     """
+    filename = os.path.basename((file.filename or '').replace('\\', '/'))
+    max_bytes = settings.max_file_size_mb * 1024 * 1024
+    
+    # Reject early when the size is already known
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Maximum size: {settings.max_file_size_mb} MB"
+        )
+    
+    fd, file_path = tempfile.mkstemp(dir=settings.upload_dir, suffix=os.path.splitext(filename)[1])
+    os.close(fd)
+    
     try:
-        # Validate file type
-        file_extension = os.path.splitext(file.filename)[1].lower()
-        if file_extension not in ['.pdf', '.docx', '.doc', '.txt']:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported file type: {file_extension}. Supported: PDF, DOCX, DOC, TXT"
-            )
-        
-        # Save uploaded file
-        file_path = os.path.join(settings.upload_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        logger.info(f"Processing uploaded file: {file.filename}")
-        
-        # Process document
-        doc_metadata = doc_processor.process_file(file_path)
-        
-        # Chunk the text
-        chunks = chunking_service.chunk_text(
-            text=doc_metadata['text'],
-            strategy='auto',
-            metadata=doc_metadata
+        total_bytes = 0
+        content_hash = hashlib.blake2b(digest_size=32)
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_READ_SIZE):
+                total_bytes += len(chunk)
+                content_hash.update(chunk)
+                if total_bytes > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"File too large. Maximum size: {settings.max_file_size_mb} MB"
+                    )
+                await buffer.write(chunk)
+    except Exception:
+        os.remove(file_path)
+        raise
+    
+    return file_path, filename, content_hash.hexdigest()
+
+
+def remove_upload(file_path: str):
+    """Delete a saved upload once it has been processed or is not needed"""
+    try:
+        os.remove(file_path)
+    except OSError as e:
+        logger.warning(f"Could not remove upload {file_path}: {e}")
+
+
+def existing_document_response(document: Document) -> DocumentUploadResponse:
+    """Build an upload response for a document that was already ingested"""
+    return DocumentUploadResponse(
+        document_id=str(document.id),
+        filename=document.filename,
+        file_type=document.file_type,
+        file_size=document.file_size,
+        language=document.language,
+        chunking_strategy=document.chunking_strategy,
+        total_chunks=document.total_chunks,
+        message="Identical document already processed"
+    )
+
+
+def validate_file_type(filename: str):
+    """Reject files whose extension is not supported"""
+    file_extension = os.path.splitext(filename)[1].lower()
+    if file_extension not in SUPPORTED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type: {file_extension}. Supported: PDF, DOCX, DOC, TXT"
         )
+
+
+def store_processed_document(
+    storage_service: StorageService,
+    doc_metadata: Dict[str, Any],
+    chunks: List[Chunk],
+    embeddings: np.ndarray
+) -> DocumentUploadResponse:
+    """
+    Persist a processed document with its chunks and embeddings
+    
+    Args:
+        storage_service: Storage backend to write to
+        doc_metadata: Output of DocumentProcessor.process_file
+        chunks: Chunks produced for the document
+        embeddings: One embedding vector per chunk
         
-        # Determine chunking strategy used
-        chunking_strategy = chunks[0].metadata.get('strategy', 'unknown') if chunks else 'none'
-        
-        # Generate embeddings for chunks
-        chunk_texts = [chunk.text for chunk in chunks]
-        embeddings = embedding_service.generate_embeddings_batch(chunk_texts)
-        
-        # Store document metadata
-        document_id = storage_service.store_document(
+    Returns:
+        Upload response for the stored document, or for the existing one if
+        identical content was stored concurrently
+    """
+    # Determine chunking strategy used
+    chunking_strategy = chunks[0].metadata.get('strategy', 'unknown') if chunks else 'none'
+    
+    # Store document metadata and chunks with embeddings in one transaction
+    chunk_data = [
+        {
+            'text': chunk.text,
+            'index': chunk.index,
+            'metadata': chunk.metadata
+        }
+        for chunk in chunks
+    ]
+    content_hash = doc_metadata.get('content_hash')
+    try:
+        document_id = storage_service.store_document_with_chunks(
             filename=doc_metadata['filename'],
             file_type=doc_metadata['file_type'],
             file_size=doc_metadata['file_size'],
             language=doc_metadata['language'],
             chunking_strategy=chunking_strategy,
-            total_chunks=len(chunks),
+            chunks=chunk_data,
+            embeddings=embeddings,
+            content_hash=content_hash,
             metadata={
                 'page_count': doc_metadata.get('page_count', 0),
                 'has_arabic_diacritics': doc_metadata.get('has_arabic_diacritics', False),
@@ -88,41 +176,226 @@ async def upload_document(file: UploadFile = File(...)):
                 'word_count': doc_metadata.get('word_count', 0)
             }
         )
+    except IntegrityError:
+        # A concurrent upload of the same content passed the hash lookup too and
+        # committed first; the UNIQUE content_hash rejected this insert
+        existing = storage_service.get_document_by_hash(content_hash) if content_hash else None
+        if existing is None:
+            raise
+        logger.info(f"Upload {doc_metadata['filename']} raced existing document {existing.id}")
+        return existing_document_response(existing)
+    
+    logger.info(f"Successfully processed document: {document_id}")
+    
+    return DocumentUploadResponse(
+        document_id=document_id,
+        filename=doc_metadata['filename'],
+        file_type=doc_metadata['file_type'],
+        file_size=doc_metadata['file_size'],
+        language=doc_metadata['language'],
+        chunking_strategy=chunking_strategy,
+        total_chunks=len(chunks),
+        message=f"Document processed successfully with {len(chunks)} chunks"
+    )
+
+
+@router.post("/upload", response_model=DocumentUploadResponse)
+async def upload_document(
+    file: UploadFile = File(...),
+    doc_processor: DocumentProcessor = Depends(get_doc_processor),
+    chunking_service: ChunkingService = Depends(get_chunking_service),
+    embedder: BatchingEmbedder = Depends(get_batching_embedder),
+    storage_service: StorageService = Depends(get_storage_service),
+    io_executor: ThreadPoolExecutor = Depends(get_io_executor),
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Upload and process a document
+    
+    Supports: PDF, DOCX, DOC, TXT
+    """
+    try:
+        # Validate file type
+        validate_file_type(file.filename)
         
-        # Store chunks with embeddings
-        chunk_data = [
-            {
-                'text': chunk.text,
-                'index': chunk.index,
-                'metadata': chunk.metadata
-            }
-            for chunk in chunks
-        ]
-        storage_service.store_chunks(document_id, chunk_data, embeddings)
+        # Save uploaded file
+        file_path, filename, content_hash = await save_upload(file, settings)
         
-        logger.info(f"Successfully processed document: {document_id}")
+        # The saved file is only needed while processing
+        try:
+            # Skip processing when byte-identical content was already ingested
+            existing = await run_blocking(io_executor, storage_service.get_document_by_hash, content_hash)
+            if existing:
+                logger.info(f"Upload {filename} matches existing document {existing.id}")
+                return existing_document_response(existing)
+            
+            logger.info(f"Processing uploaded file: {filename}")
+            
+            # Process document
+            doc_metadata = await run_blocking(io_executor, doc_processor.process_file, file_path)
+            doc_metadata['filename'] = filename
+            doc_metadata['content_hash'] = content_hash
+            
+            # Chunk the text
+            chunks = await run_blocking(
+                io_executor,
+                chunking_service.chunk_text,
+                text=doc_metadata['text'],
+                strategy='auto',
+                metadata=doc_metadata
+            )
+            
+            # Generate embeddings for chunks
+            chunk_texts = [chunk.text for chunk in chunks]
+            embeddings = await embedder.embed_many(chunk_texts)
+            
+            return await run_blocking(
+                io_executor,
+                store_processed_document,
+                storage_service,
+                doc_metadata,
+                chunks,
+                embeddings
+            )
+        finally:
+            remove_upload(file_path)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error processing document: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/upload_batch", response_model=BatchUploadResponse)
+async def upload_batch(
+    files: List[UploadFile] = File(...),
+    doc_processor: DocumentProcessor = Depends(get_doc_processor),
+    chunking_service: ChunkingService = Depends(get_chunking_service),
+    embedder: BatchingEmbedder = Depends(get_batching_embedder),
+    storage_service: StorageService = Depends(get_storage_service),
+    io_executor: ThreadPoolExecutor = Depends(get_io_executor),
+    process_executor: ProcessPoolExecutor = Depends(get_process_executor),
+    settings: Settings = Depends(get_settings)
+):
+    """
+    Upload and process several documents in one request
+    
+    Files are parsed in parallel worker processes and all of their chunks
+    are embedded in a single batch.
+    """
+    try:
+        for file in files:
+            validate_file_type(file.filename)
         
-        return DocumentUploadResponse(
-            document_id=document_id,
-            filename=doc_metadata['filename'],
-            file_type=doc_metadata['file_type'],
-            file_size=doc_metadata['file_size'],
-            language=doc_metadata['language'],
-            chunking_strategy=chunking_strategy,
-            total_chunks=len(chunks),
-            message=f"Document processed successfully with {len(chunks)} chunks"
+        # Save all uploaded files concurrently; if any save fails, delete the
+        # ones that succeeded before reporting the error
+        results = await asyncio.gather(
+            *[save_upload(file, settings) for file in files],
+            return_exceptions=True
         )
+        saved = [result for result in results if not isinstance(result, BaseException)]
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for file_path, _, _ in saved:
+                remove_upload(file_path)
+            raise errors[0]
+        
+        # The saved files are only needed while processing
+        try:
+            # Reuse documents that were already ingested and process each
+            # distinct content only once
+            existing = await run_blocking(
+                io_executor,
+                storage_service.get_documents_by_hashes,
+                [content_hash for _, _, content_hash in saved]
+            )
+            responses: List[Optional[DocumentUploadResponse]] = [None] * len(saved)
+            pending: Dict[str, List[int]] = {}
+            for i, (_, _, content_hash) in enumerate(saved):
+                if content_hash in existing:
+                    responses[i] = existing_document_response(existing[content_hash])
+                elif content_hash in pending:
+                    pending[content_hash].append(i)
+                else:
+                    pending[content_hash] = [i]
+            to_process = [saved[positions[0]] for positions in pending.values()]
+            
+            logger.info(f"Processing {len(to_process)} of {len(files)} uploaded files")
+            
+            # Parse documents in parallel worker processes (CPU-bound)
+            docs_metadata = await run_blocking(
+                io_executor,
+                doc_processor.process_files,
+                [file_path for file_path, _, _ in to_process],
+                executor=process_executor
+            )
+            for doc_metadata, (_, filename, content_hash) in zip(docs_metadata, to_process):
+                doc_metadata['filename'] = filename
+                doc_metadata['content_hash'] = content_hash
+            
+            # Chunk each document
+            docs_chunks = await asyncio.gather(*[
+                run_blocking(
+                    io_executor,
+                    chunking_service.chunk_text,
+                    text=doc_metadata['text'],
+                    strategy='auto',
+                    metadata=doc_metadata
+                )
+                for doc_metadata in docs_metadata
+            ])
+            
+            # Embed the chunks of every document in one batch
+            all_texts = [chunk.text for chunks in docs_chunks for chunk in chunks]
+            all_embeddings = await embedder.embed_many(all_texts)
+            
+            # Split embeddings back per document and store
+            offset = 0
+            for doc_metadata, chunks, positions in zip(docs_metadata, docs_chunks, pending.values()):
+                embeddings = all_embeddings[offset:offset + len(chunks)]
+                offset += len(chunks)
+                response = await run_blocking(
+                    io_executor,
+                    store_processed_document,
+                    storage_service,
+                    doc_metadata,
+                    chunks,
+                    embeddings
+                )
+                responses[positions[0]] = response
+                # Later copies in the same batch were not processed themselves
+                for i in positions[1:]:
+                    responses[i] = response.model_copy(update={
+                        'filename': saved[i][1],
+                        'message': "Identical document already processed"
+                    })
+            
+            return BatchUploadResponse(
+                documents=responses,
+                total_documents=len(responses),
+                total_chunks=len(all_texts),
+                message=f"Processed {len(to_process)} new documents with {len(all_texts)} chunks"
+            )
+        finally:
+            for file_path, _, _ in saved:
+                remove_upload(file_path)
     
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error processing document: {e}")
+        logger.error(f"Error processing batch upload: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.get("/", response_model=List[DocumentMetadata], response_model_by_alias=False)
-async def list_documents():
+async def list_documents(
+    storage_service: StorageService = Depends(get_storage_service),
+    io_executor: ThreadPoolExecutor = Depends(get_io_executor)
+):
     """Get all documents"""
     try:
-        documents = storage_service.get_all_documents()
+        documents = await run_blocking(io_executor, storage_service.get_all_documents)
         return documents
     except Exception as e:
         logger.error(f"Error listing documents: {e}")
@@ -130,10 +403,14 @@ async def list_documents():
 
 
 @router.get("/{document_id}", response_model=DocumentMetadata, response_model_by_alias=False)
-async def get_document(document_id: str):
+async def get_document(
+    document_id: str,
+    storage_service: StorageService = Depends(get_storage_service),
+    io_executor: ThreadPoolExecutor = Depends(get_io_executor)
+):
     """Get document by ID"""
     try:
-        document = storage_service.get_document(document_id)
+        document = await run_blocking(io_executor, storage_service.get_document, document_id)
         if not document:
             raise HTTPException(status_code=404, detail="Document not found")
         return document
@@ -145,15 +422,19 @@ async def get_document(document_id: str):
 
 
 @router.delete("/{document_id}")
-async def delete_document(document_id: str):
+async def delete_document(
+    document_id: str,
+    storage_service: StorageService = Depends(get_storage_service),
+    io_executor: ThreadPoolExecutor = Depends(get_io_executor)
+):
     """Delete document and all its chunks"""
     try:
-        document = storage_service.get_document(document_id)
-        if not document:
+        deleted = await run_blocking(
+            io_executor, storage_service.delete_document, document_id
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="Document not found")
         
-        storage_service.delete_document(document_id)
-        
         return {"message": f"Document {document_id} deleted successfully"}
     except HTTPException:
         raise
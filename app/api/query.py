@@ -3,20 +3,22 @@ Query API Endpoints
 Handles search and retrieval operations
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Depends
 from loguru import logger
 
 from app.models.schemas import QueryRequest, QueryResponse
-from app.services import RAGService
+from app.services import RAGService, BatchingEmbedder, SearchBatcher
+from app.api.dependencies import get_rag_service, get_batching_embedder, get_search_batcher
 
 router = APIRouter(prefix="/api/query", tags=["query"])
 
-# Initialize RAG service
-rag_service = RAGService()
-
 
 @router.post("/", response_model=QueryResponse)
-async def search_documents(request: QueryRequest):
+async def search_documents(
+    request: QueryRequest,
+    embedder: BatchingEmbedder = Depends(get_batching_embedder),
+    search_batcher: SearchBatcher = Depends(get_search_batcher)
+):
     """
     Search documents using semantic similarity
     
@@ -26,25 +28,17 @@ async def search_documents(request: QueryRequest):
     - Filtering by language
     """
     try:
-        # Build filters
-        filters = {}
-        if request.document_id:
-            filters['document_id'] = request.document_id
-        if request.language:
-            filters['language'] = request.language
+        # Embed the query alongside other concurrent requests
+        query_embedding = await embedder.embed(request.query)
         
-        # Perform search
-        if filters:
-            results = rag_service.hybrid_search(
-                query=request.query,
-                top_k=request.top_k,
-                filters=filters
-            )
-        else:
-            results = rag_service.semantic_search(
-                query=request.query,
-                top_k=request.top_k
-            )
+        # Search alongside concurrent requests with the same top_k and filters
+        results = await search_batcher.search(
+            request.query,
+            query_embedding,
+            top_k=request.top_k,
+            document_id=request.document_id,
+            language=request.language
+        )
         
         return QueryResponse(**results)
     
@@ -54,14 +48,23 @@ async def search_documents(request: QueryRequest):
 
 
 @router.get("/context")
-async def get_context(query: str, top_k: int = 3):
+async def get_context(
+    query: str,
+    top_k: int = 3,
+    rag_service: RAGService = Depends(get_rag_service),
+    embedder: BatchingEmbedder = Depends(get_batching_embedder),
+    search_batcher: SearchBatcher = Depends(get_search_batcher)
+):
     """
     Get context for a query (useful for LLM integration)
     
     Returns concatenated relevant chunks
     """
     try:
-        context = rag_service.get_context_for_query(query, top_k)
+        # Same batched path as search, so the model and stores stay off the event loop
+        query_embedding = await embedder.embed(query)
+        results = await search_batcher.search(query, query_embedding, top_k=top_k)
+        context = rag_service.build_context(results)
         return {
             "query": query,
             "context": context,
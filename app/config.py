@@ -1,3 +1,5 @@
+import os
+from functools import lru_cache
 from pydantic_settings import BaseSettings
 from pydantic import field_validator
 from typing import Optional, Union
@@ -26,6 +28,17 @@ class Settings(BaseSettings):
     
     # Embedding Model
     embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    embedding_cache_size: int = 10000
+    embedding_fp16: bool = True
+    embedding_max_batch_size: int = 64
+    embedding_max_wait_ms: float = 5
+    
+    # Semantic Query Cache
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_ttl: int = 300
+    semantic_cache_size: int = 1024
+    search_max_batch_size: int = 32
+    search_max_wait_ms: float = 5
     
     # Chunking Configuration
     default_chunk_size: int = 512
@@ -35,6 +48,13 @@ class Settings(BaseSettings):
     # Upload Directory
     upload_dir: str = "./uploads"
     
+    # NLTK data directory (None uses NLTK's default search path)
+    nltk_data_dir: Optional[str] = None
+    
+    # Concurrency
+    max_workers: int = os.cpu_count() or 4
+    torch_num_threads: int = max(1, (os.cpu_count() or 2) // 2)
+    
     # CORS
     allowed_origins: Union[str, list] = ["http://localhost:3000", "http://localhost:8000"]
     
@@ -52,4 +72,12 @@ class Settings(BaseSettings):
         extra = "ignore"
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """
+    Get the application settings, parsed once and cached
+    
+    Use as a FastAPI dependency so tests can swap it via
+    app.dependency_overrides[get_settings].
+    """
+    return Settings()
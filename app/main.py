@@ -3,14 +3,31 @@ Pyxon AI Document Parser - Main Application
 FastAPI application for RAG-powered document processing
 """
 
-from fastapi import FastAPI
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from loguru import logger
+from pathlib import Path
+import asyncio
+import multiprocessing
 import sys
+import torch
 
-from app.config import settings
+from app.config import Settings, get_settings
 from app.api import documents_router, query_router
+from app.services import (
+    DocumentProcessor,
+    ChunkingService,
+    BatchingEmbedder,
+    RAGService,
+    SearchBatcher,
+    EmbeddingService,
+    StorageService,
+    ensure_nltk_data
+)
 
 # Configure logging
 logger.remove()
@@ -20,19 +37,103 @@ logger.add(
     level="INFO"
 )
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared services on startup and release them on shutdown"""
+    # Resolve settings the same way endpoints do, so dependency overrides apply here too
+    settings: Settings = app.dependency_overrides.get(get_settings, get_settings)()
+    
+    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
+    
+    torch.set_num_threads(settings.torch_num_threads)
+    
+    # Prepare filesystem and NLTK data before serving
+    Path(settings.upload_dir).mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(ensure_nltk_data, settings.nltk_data_dir)
+    
+    # Worker processes for CPU-bound parsing. Spawned rather than forked so
+    # they do not inherit the torch and ChromaDB threads of this process
+    process_executor = ProcessPoolExecutor(
+        max_workers=settings.max_workers,
+        mp_context=multiprocessing.get_context("spawn")
+    )
+    app.state.process_executor = process_executor
+    
+    # Worker threads for blocking stages (embeddings go through the batching embedder)
+    io_executor = ThreadPoolExecutor(max_workers=settings.max_workers)
+    app.state.io_executor = io_executor
+    
+    # Load services once and share them across requests
+    embedding_service = EmbeddingService(
+        model_name=settings.embedding_model,
+        cache_size=settings.embedding_cache_size,
+        use_fp16=settings.embedding_fp16
+    )
+    storage_service = StorageService(settings)
+    
+    app.state.doc_processor = DocumentProcessor()
+    app.state.chunking_service = ChunkingService(
+        default_chunk_size=settings.default_chunk_size,
+        default_overlap=settings.default_chunk_overlap
+    )
+    app.state.embedding_service = embedding_service
+    app.state.storage_service = storage_service
+    rag_service = RAGService(
+        storage=storage_service,
+        embedding_service=embedding_service,
+        settings=settings
+    )
+    app.state.rag_service = rag_service
+    
+    # Prime the model so the first request doesn't pay for lazy initialization
+    await asyncio.to_thread(embedding_service.warmup)
+    
+    # Coalesce concurrent embedding requests into shared forward passes
+    batching_embedder = BatchingEmbedder(
+        embedding_service,
+        max_batch_size=settings.embedding_max_batch_size,
+        max_wait_ms=settings.embedding_max_wait_ms
+    )
+    batching_embedder.start()
+    app.state.batching_embedder = batching_embedder
+    
+    # Coalesce concurrent searches into shared vector database queries
+    search_batcher = SearchBatcher(
+        rag_service,
+        max_batch_size=settings.search_max_batch_size,
+        max_wait_ms=settings.search_max_wait_ms
+    )
+    search_batcher.start()
+    app.state.search_batcher = search_batcher
+    
+    logger.info("Application ready to process documents!")
+    
+    yield
+    
+    logger.info("Shutting down application...")
+    await search_batcher.stop()
+    await batching_embedder.stop()
+    await asyncio.to_thread(process_executor.shutdown, cancel_futures=True)
+    io_executor.shutdown(wait=False)
+    storage_service.close()
+
+
 # Create FastAPI app
 app = FastAPI(
-    title=settings.app_name,
-    version=settings.app_version,
+    title=get_settings().app_name,
+    version=get_settings().app_version,
     description="AI-powered document parser with RAG capabilities for intelligent document processing and retrieval",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.allowed_origins,
+    allow_origins=get_settings().allowed_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
@@ -50,7 +151,7 @@ except RuntimeError:
 
 
 @app.get("/api/health")
-async def health_check():
+async def health_check(settings: Settings = Depends(get_settings)):
     """Health check endpoint"""
     return {
         "status": "healthy",
@@ -59,19 +160,6 @@ async def health_check():
     }
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Run on application startup"""
-    logger.info(f"Starting {settings.app_name} v{settings.app_version}")
-    logger.info("Application ready to process documents!")
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Run on application shutdown"""
-    logger.info("Shutting down application...")
-
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,34 @@
+"""
+Database Migrations
+Alembic environment and revision scripts for the SQL schema
+"""
+
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy.engine import Engine
+from loguru import logger
+
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+
+def run_migrations(engine: Engine, revision: str = "head"):
+    """
+    Upgrade the database schema to the given revision
+    
+    Databases created by earlier versions with create_all (no alembic_version
+    table) are adopted by the initial revision and upgraded in place.
+    
+    Args:
+        engine: Engine connected to the target database
+        revision: Target revision
+    """
+    config = Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
+    
+    logger.info(f"Database schema upgraded to {revision}")
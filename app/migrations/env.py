@@ -0,0 +1,67 @@
+"""
+Alembic environment
+
+Uses the connection passed in by run_migrations when there is one, otherwise
+connects to sqlalchemy.url from alembic.ini or the DATABASE_URL setting.
+"""
+
+from alembic import context
+from sqlalchemy import create_engine, pool, text
+
+from app.config import get_settings
+from app.models.document import Base
+
+
+config = context.config
+target_metadata = Base.metadata
+
+# Arbitrary key for the PostgreSQL advisory lock taken while migrating
+MIGRATION_LOCK_ID = 7263490
+
+
+def get_url() -> str:
+    """Database URL for migrations"""
+    return config.get_main_option("sqlalchemy.url") or get_settings().database_url
+
+
+def run_migrations_offline():
+    """Emit migration SQL without connecting to a database"""
+    context.configure(
+        url=get_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"}
+    )
+    
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection):
+    """Run migrations on an open connection"""
+    context.configure(connection=connection, target_metadata=target_metadata)
+    
+    with context.begin_transaction():
+        if connection.dialect.name == "postgresql":
+            # Several app workers may start at once; let one migrate at a time
+            connection.execute(text(f"SELECT pg_advisory_xact_lock({MIGRATION_LOCK_ID})"))
+        context.run_migrations()
+
+
+def run_migrations_online():
+    """Run migrations against a live database"""
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        do_run_migrations(connection)
+        return
+    
+    engine = create_engine(get_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        do_run_migrations(connection)
+        connection.commit()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,53 @@
+"""Initial schema
+
+Tables as originally created by Base.metadata.create_all. Existing tables
+are left untouched so databases created before migrations were introduced
+are adopted and upgraded in place.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    
+    if not inspector.has_table('documents'):
+        op.create_table(
+            'documents',
+            sa.Column('id', sa.String(36), primary_key=True),
+            sa.Column('filename', sa.String(255), nullable=False),
+            sa.Column('file_type', sa.String(10), nullable=False),
+            sa.Column('file_size', sa.Integer, nullable=False),
+            sa.Column('language', sa.String(50), nullable=False),
+            sa.Column('chunking_strategy', sa.String(50), nullable=False),
+            sa.Column('total_chunks', sa.Integer, nullable=False),
+            sa.Column('upload_date', sa.DateTime, nullable=True),
+            sa.Column('doc_metadata', sa.JSON, nullable=True)
+        )
+    
+    if not inspector.has_table('chunks'):
+        op.create_table(
+            'chunks',
+            sa.Column('id', sa.String(36), primary_key=True),
+            sa.Column('document_id', sa.String(36), sa.ForeignKey('documents.id'), nullable=False),
+            sa.Column('chunk_index', sa.Integer, nullable=False),
+            sa.Column('chunk_text', sa.Text, nullable=False),
+            sa.Column('chunk_size', sa.Integer, nullable=False),
+            sa.Column('chunk_metadata', sa.JSON, nullable=True)
+        )
+
+
+def downgrade():
+    op.drop_table('chunks')
+    op.drop_table('documents')
@@ -0,0 +1,54 @@
+"""Store metadata as JSONB and index hot filter columns
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def _index_names(inspector, table: str) -> set:
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    
+    # JSONB only exists on PostgreSQL; other databases keep plain JSON
+    if bind.dialect.name == 'postgresql':
+        op.alter_column('documents', 'doc_metadata', type_=JSONB,
+                        postgresql_using='doc_metadata::jsonb')
+        op.alter_column('chunks', 'chunk_metadata', type_=JSONB,
+                        postgresql_using='chunk_metadata::jsonb')
+    
+    if 'ix_documents_language' not in _index_names(inspector, 'documents'):
+        op.create_index('ix_documents_language', 'documents', ['language'])
+    
+    chunk_indexes = _index_names(inspector, 'chunks')
+    if 'ix_chunks_document_id' not in chunk_indexes:
+        op.create_index('ix_chunks_document_id', 'chunks', ['document_id'])
+    if 'ix_chunks_chunk_metadata' not in chunk_indexes:
+        op.create_index('ix_chunks_chunk_metadata', 'chunks', ['chunk_metadata'],
+                        postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_chunks_chunk_metadata', table_name='chunks')
+    op.drop_index('ix_chunks_document_id', table_name='chunks')
+    op.drop_index('ix_documents_language', table_name='documents')
+    
+    if op.get_bind().dialect.name == 'postgresql':
+        op.alter_column('chunks', 'chunk_metadata', type_=sa.JSON,
+                        postgresql_using='chunk_metadata::json')
+        op.alter_column('documents', 'doc_metadata', type_=sa.JSON,
+                        postgresql_using='doc_metadata::json')
@@ -0,0 +1,30 @@
+"""Add a unique content fingerprint to documents
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    
+    if 'content_hash' not in {column['name'] for column in inspector.get_columns('documents')}:
+        op.add_column('documents', sa.Column('content_hash', sa.String(64), nullable=True))
+    
+    if 'ix_documents_content_hash' not in {index['name'] for index in inspector.get_indexes('documents')}:
+        op.create_index('ix_documents_content_hash', 'documents', ['content_hash'], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_documents_content_hash', table_name='documents')
+    op.drop_column('documents', 'content_hash')
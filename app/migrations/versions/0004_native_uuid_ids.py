@@ -0,0 +1,83 @@
+"""Store document and chunk IDs as native UUIDs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+# Constraint names used by the batch (non-PostgreSQL) path
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'
+}
+
+
+def _is_uuid(inspector) -> bool:
+    column = next(c for c in inspector.get_columns('documents') if c['name'] == 'id')
+    # Non-PostgreSQL databases reflect Uuid as its CHAR(32) storage type
+    return 'UUID' in str(column['type']).upper() or getattr(column['type'], 'length', None) == 32
+
+
+def _document_fk_name(inspector) -> str:
+    return next(
+        fk['name'] for fk in inspector.get_foreign_keys('chunks')
+        if fk['referred_table'] == 'documents'
+    )
+
+
+def upgrade():
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if _is_uuid(inspector):
+        return
+    
+    if bind.dialect.name == 'postgresql':
+        fk_name = _document_fk_name(inspector)
+        op.drop_constraint(fk_name, 'chunks', type_='foreignkey')
+        op.alter_column('documents', 'id', type_=sa.Uuid, postgresql_using='id::uuid')
+        op.alter_column('chunks', 'id', type_=sa.Uuid, postgresql_using='id::uuid')
+        op.alter_column('chunks', 'document_id', type_=sa.Uuid, postgresql_using='document_id::uuid')
+        op.create_foreign_key(fk_name, 'chunks', 'documents', ['document_id'], ['id'])
+        return
+    
+    # Elsewhere Uuid is CHAR(32) holding the hex digits without hyphens
+    op.execute("UPDATE documents SET id = REPLACE(id, '-', '')")
+    op.execute("UPDATE chunks SET id = REPLACE(id, '-', ''), document_id = REPLACE(document_id, '-', '')")
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.alter_column('id', type_=sa.Uuid)
+    with op.batch_alter_table('chunks', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('id', type_=sa.Uuid)
+        batch_op.alter_column('document_id', type_=sa.Uuid)
+
+
+def downgrade():
+    bind = op.get_bind()
+    
+    if bind.dialect.name == 'postgresql':
+        fk_name = _document_fk_name(sa.inspect(bind))
+        op.drop_constraint(fk_name, 'chunks', type_='foreignkey')
+        op.alter_column('chunks', 'document_id', type_=sa.String(36), postgresql_using='document_id::text')
+        op.alter_column('chunks', 'id', type_=sa.String(36), postgresql_using='id::text')
+        op.alter_column('documents', 'id', type_=sa.String(36), postgresql_using='id::text')
+        op.create_foreign_key(fk_name, 'chunks', 'documents', ['document_id'], ['id'])
+        return
+    
+    with op.batch_alter_table('chunks', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('document_id', type_=sa.String(36))
+        batch_op.alter_column('id', type_=sa.String(36))
+    with op.batch_alter_table('documents') as batch_op:
+        batch_op.alter_column('id', type_=sa.String(36))
+    for table, columns in (('documents', ['id']), ('chunks', ['id', 'document_id'])):
+        for column in columns:
+            op.execute(
+                f"UPDATE {table} SET {column} = substr({column}, 1, 8) || '-' || substr({column}, 9, 4) || '-' || "
+                f"substr({column}, 13, 4) || '-' || substr({column}, 17, 4) || '-' || substr({column}, 21)"
+            )
@@ -0,0 +1,55 @@
+"""Delete chunks with their document via ON DELETE CASCADE
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-15
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+# Constraint names used by the batch (non-PostgreSQL) path
+NAMING_CONVENTION = {
+    'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'
+}
+
+
+def _document_fk(inspector) -> dict:
+    return next(
+        fk for fk in inspector.get_foreign_keys('chunks')
+        if fk['referred_table'] == 'documents'
+    )
+
+
+def _replace_document_fk(ondelete):
+    """Recreate the chunks -> documents foreign key with the given ON DELETE action"""
+    bind = op.get_bind()
+    fk = _document_fk(sa.inspect(bind))
+    
+    if bind.dialect.name == 'postgresql':
+        op.drop_constraint(fk['name'], 'chunks', type_='foreignkey')
+        op.create_foreign_key(fk['name'], 'chunks', 'documents', ['document_id'], ['id'], ondelete=ondelete)
+        return
+    
+    fk_name = fk['name'] or NAMING_CONVENTION['fk'] % {
+        'table_name': 'chunks', 'column_0_name': 'document_id', 'referred_table_name': 'documents'
+    }
+    with op.batch_alter_table('chunks', naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.drop_constraint(fk_name, type_='foreignkey')
+        batch_op.create_foreign_key(fk_name, 'documents', ['document_id'], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    fk = _document_fk(sa.inspect(op.get_bind()))
+    if (fk.get('options') or {}).get('ondelete', '').upper() != 'CASCADE':
+        _replace_document_fk('CASCADE')
+
+
+def downgrade():
+    _replace_document_fk(None)
@@ -3,6 +3,7 @@
 from app.models.document import Base, Document, Chunk
 from app.models.schemas import (
     DocumentUploadResponse,
+    BatchUploadResponse,
     DocumentMetadata,
     ChunkSchema,
     QueryRequest,
@@ -16,6 +17,7 @@ __all__ = [
     "Document",
     "Chunk",
     "DocumentUploadResponse",
+    "BatchUploadResponse",
     "DocumentMetadata",
     "ChunkSchema",
     "QueryRequest",
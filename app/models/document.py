@@ -1,6 +1,7 @@
 """Database models for document storage"""
 
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Text, Float
+from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Text, Float, Index, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -8,23 +9,28 @@ import uuid
 
 Base = declarative_base()
 
+# Binary JSON on PostgreSQL (stored pre-parsed, indexable), plain JSON elsewhere
+JSONType = JSON().with_variant(JSONB(), 'postgresql')
+
 
 class Document(Base):
     """Main document table storing metadata"""
     __tablename__ = "documents"
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)  # Native 16-byte uuid on PostgreSQL
     filename = Column(String(255), nullable=False)
     file_type = Column(String(10), nullable=False)
     file_size = Column(Integer, nullable=False)
-    language = Column(String(50), nullable=False)
+    language = Column(String(50), nullable=False, index=True)
     chunking_strategy = Column(String(50), nullable=False)
     total_chunks = Column(Integer, nullable=False)
     upload_date = Column(DateTime, default=datetime.utcnow)
-    doc_metadata = Column(JSON, nullable=True)
+    doc_metadata = Column(JSONType, nullable=True)
+    content_hash = Column(String(64), nullable=True, unique=True, index=True)  # BLAKE2b-256 of file bytes
     
     # Relationship to chunks
-    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan")
+    chunks = relationship("Chunk", back_populates="document", cascade="all, delete-orphan",
+                          passive_deletes=True)
     
     def __repr__(self):
         return f"<Document(id={self.id}, filename={self.filename}, language={self.language})>"
@@ -33,13 +39,17 @@ class Document(Base):
 class Chunk(Base):
     """Chunk table storing individual text chunks"""
     __tablename__ = "chunks"
+    __table_args__ = (
+        # GIN index on PostgreSQL for containment queries on chunk metadata
+        Index('ix_chunks_chunk_metadata', 'chunk_metadata', postgresql_using='gin'),
+    )
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    document_id = Column(String(36), ForeignKey("documents.id"), nullable=False)
+    id = Column(Uuid, primary_key=True, default=uuid.uuid4)
+    document_id = Column(Uuid, ForeignKey("documents.id", ondelete="CASCADE"), nullable=False, index=True)
     chunk_index = Column(Integer, nullable=False)
     chunk_text = Column(Text, nullable=False)
     chunk_size = Column(Integer, nullable=False)
-    chunk_metadata = Column(JSON, nullable=True)
+    chunk_metadata = Column(JSONType, nullable=True)
     
     # Relationship to document
     document = relationship("Document", back_populates="chunks")
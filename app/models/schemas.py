@@ -3,6 +3,7 @@
 from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from uuid import UUID
 
 
 class DocumentUploadResponse(BaseModel):
@@ -17,6 +18,14 @@ class DocumentUploadResponse(BaseModel):
     message: str
 
 
+class BatchUploadResponse(BaseModel):
+    """Response after a multi-document upload"""
+    documents: List[DocumentUploadResponse]
+    total_documents: int
+    total_chunks: int
+    message: str
+
+
 class DocumentMetadata(BaseModel):
     """Document metadata schema"""
     model_config = {
@@ -24,7 +33,7 @@ class DocumentMetadata(BaseModel):
         'populate_by_name': True
     }
     
-    id: str
+    id: UUID
     filename: str
     file_type: str
     file_size: int
@@ -42,8 +51,8 @@ class ChunkSchema(BaseModel):
         'populate_by_name': True
     }
     
-    id: str
-    document_id: str
+    id: UUID
+    document_id: UUID
     chunk_index: int
     chunk_text: str
     chunk_size: int
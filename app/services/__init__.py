@@ -1,16 +1,25 @@
 """Services package initialization"""
 
 from app.services.document_processor import DocumentProcessor
-from app.services.chunking_service import ChunkingService, Chunk
-from app.services.embedding_service import EmbeddingService
-from app.services.storage_service import StorageService
+from app.services.chunking_service import ChunkingService, Chunk, ensure_nltk_data
+from app.services.embedding_service import EmbeddingService, get_shared_embedding_service
+from app.services.batching_embedder import BatchingEmbedder
+from app.services.storage_service import StorageService, get_shared_storage_service
 from app.services.rag_service import RAGService
+from app.services.search_batcher import SearchBatcher
+from app.services.semantic_cache import SemanticCache
 
 __all__ = [
     "DocumentProcessor",
     "ChunkingService",
     "Chunk",
+    "ensure_nltk_data",
     "EmbeddingService",
+    "get_shared_embedding_service",
+    "BatchingEmbedder",
     "StorageService",
-    "RAGService"
+    "get_shared_storage_service",
+    "RAGService",
+    "SearchBatcher",
+    "SemanticCache"
 ]
@@ -0,0 +1,140 @@
+"""
+Batching Embedder
+Coalesces concurrent embedding requests into shared model forward passes
+"""
+
+import asyncio
+from typing import List, Optional, Tuple
+import numpy as np
+from loguru import logger
+
+from app.services.embedding_service import EmbeddingService
+
+
+class BatchingEmbedder:
+    """Dynamic batching front-end for EmbeddingService"""
+
+    def __init__(
+        self,
+        embedding_service: EmbeddingService,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5
+    ):
+        """
+        Initialize batching embedder
+
+        Args:
+            embedding_service: Service that runs the model
+            max_batch_size: Number of texts that triggers an immediate forward pass
+            max_wait_ms: How long to wait for more requests before running a batch
+        """
+        self.embedding_service = embedding_service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "asyncio.Queue[Tuple[List[str], asyncio.Future]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background batching task (requires a running event loop)"""
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Batching embedder started")
+
+    async def stop(self):
+        """Stop the background task, failing any requests still queued"""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batching embedder stopped"))
+
+    async def embed(self, text: str) -> np.ndarray:
+        """
+        Generate embedding for a single text
+
+        Args:
+            text: Input text
+
+        Returns:
+            Embedding vector
+        """
+        # Repeated queries skip the batching window and the worker thread entirely
+        cached = self.embedding_service.get_cached_embedding(text)
+        if cached is not None:
+            return cached
+
+        embeddings = await self.embed_many([text])
+        return embeddings[0]
+
+    async def embed_many(self, texts: List[str]) -> np.ndarray:
+        """
+        Generate embeddings for several texts, sharing a batch with other callers
+
+        Args:
+            texts: Input texts
+
+        Returns:
+            Embedding matrix with one row per text
+        """
+        if not texts:
+            return np.empty((0, self.embedding_service.get_embedding_dimension()), dtype=np.float32)
+        if self._worker is None:
+            raise RuntimeError("Batching embedder not started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _run(self):
+        """Collect queued requests into batches and run them through the model"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            requests = [await self._queue.get()]
+            batch_size = len(requests[0][0])
+
+            # Keep collecting until the batch is full or the wait window closes
+            deadline = loop.time() + self.max_wait
+            while batch_size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+                batch_size += len(request[0])
+
+            texts = [text for request_texts, _ in requests for text in request_texts]
+            try:
+                embeddings = await asyncio.to_thread(
+                    self.embedding_service.generate_embeddings_batch,
+                    texts
+                )
+            except Exception as e:
+                logger.error(f"Error in batched embedding: {e}")
+                for _, future in requests:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            # Hand each caller its slice of the batch
+            offset = 0
+            for request_texts, future in requests:
+                if not future.done():
+                    future.set_result(embeddings[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+            if len(requests) > 1:
+                logger.debug(f"Batched {len(requests)} requests into {len(texts)} texts")
@@ -4,19 +4,34 @@ Implements both fixed-size and dynamic chunking strategies
 """
 
 import re
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass
 from loguru import logger
+import numpy as np
 import nltk
 
-# Download required NLTK data (run once)
-try:
-    nltk.data.find('tokenizers/punkt')
-except LookupError:
-    nltk.download('punkt', quiet=True)
+
+def ensure_nltk_data(download_dir: Optional[str] = None):
+    """
+    Make sure the Punkt tokenizer data is available, downloading it if missing
+    
+    Call once at application startup rather than on import, so importing
+    this module never touches the network.
+    
+    Args:
+        download_dir: Optional directory to search and download NLTK data into
+    """
+    if download_dir and download_dir not in nltk.data.path:
+        nltk.data.path.append(download_dir)
+    
+    try:
+        nltk.data.find('tokenizers/punkt')
+    except LookupError:
+        logger.info("Downloading NLTK punkt tokenizer...")
+        nltk.download('punkt', download_dir=download_dir, quiet=True)
 
 
-@dataclass
+@dataclass(slots=True)
 class Chunk:
     """Represents a text chunk"""
     text: str
@@ -29,6 +44,14 @@ class Chunk:
 class ChunkingService:
     """Intelligent text chunking with strategy selection"""
     
+    # Precompiled patterns
+    _LIST_RE = re.compile(r'[\-\*\•\d]+[\.\)]\s+')
+    _PARA_RE = re.compile(r'\n\s*\n')
+    _SENTENCE_FALLBACK_RE = re.compile(r'[.!?]+')
+    
+    # Punkt tokenizer, loaded once on first use
+    _tokenizer = None
+    
     def __init__(self, default_chunk_size: int = 512, default_overlap: int = 50):
         self.default_chunk_size = default_chunk_size
         self.default_overlap = default_overlap
@@ -116,6 +139,10 @@ class ChunkingService:
         chunk_size = self.default_chunk_size
         overlap = self.default_overlap
         
+        # Character offset of each word in ' '.join(words)
+        word_lengths = np.fromiter((len(w) for w in words), dtype=np.int64, count=len(words))
+        offsets = np.concatenate(([0], np.cumsum(word_lengths + 1)))
+        
         start_idx = 0
         chunk_index = 0
         
@@ -126,8 +153,8 @@ class ChunkingService:
             chunk_text = ' '.join(chunk_words)
             
             # Calculate character positions (approximate)
-            start_char = len(' '.join(words[:start_idx]))
-            end_char = start_char + len(chunk_text)
+            start_char = int(offsets[start_idx])
+            end_char = int(offsets[end_idx]) - 1
             
             # Create chunk
             chunk = Chunk(
@@ -270,12 +297,15 @@ class ChunkingService:
         if not sentences:
             return 0.0
         
+        # Sentences partition the text at whitespace, so the total word count
+        # of all sentences equals the word count of the text itself
+        words = text.lower().split()
+        
         # Average sentence length
-        avg_sentence_length = sum(len(s.split()) for s in sentences) / len(sentences)
+        avg_sentence_length = len(words) / len(sentences)
         length_score = min(avg_sentence_length / 30, 1.0)  # Normalize to 0-1
         
         # Vocabulary diversity (unique words / total words)
-        words = text.lower().split()
         if words:
             diversity_score = len(set(words)) / len(words)
         else:
@@ -296,24 +326,19 @@ class ChunkingService:
         Returns:
             True if structural elements are found
         """
-        # Check for headings (lines with fewer words, possibly all caps)
-        lines = text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
+        for line in text.split('\n'):
+            line = line.lstrip()
             if not line:
                 continue
             
-            # Potential heading: short line (< 10 words)
-            if len(line.split()) < 10:
-                # Check if it's all caps or ends with colon
-                if line.isupper() or line.endswith(':'):
-                    return True
-        
-        # Check for bullet points or numbered lists
-        list_pattern = re.compile(r'^\s*[\-\*\•\d]+[\.\)]\s+')
-        for line in lines:
-            if list_pattern.match(line):
+            # Check for bullet points or numbered lists (regex only runs on candidate lines)
+            first = line[0]
+            if (first in '-*•' or first.isdecimal()) and self._LIST_RE.match(line):
+                return True
+            
+            # Potential heading: short line (< 10 words) that is all caps or ends with colon
+            line = line.rstrip()
+            if (line.endswith(':') or line.isupper()) and len(line.split()) < 10:
                 return True
         
         return False
@@ -321,16 +346,23 @@ class ChunkingService:
     def _split_paragraphs(self, text: str) -> List[str]:
         """Split text into paragraphs"""
         # Split by double newlines or more
-        paragraphs = re.split(r'\n\s*\n', text)
+        paragraphs = self._PARA_RE.split(text)
         return [p.strip() for p in paragraphs if p.strip()]
     
     def _split_sentences(self, text: str) -> List[str]:
         """Split text into sentences using NLTK"""
         try:
-            sentences = nltk.sent_tokenize(text)
+            sentences = self._get_tokenizer().tokenize(text)
             return [s.strip() for s in sentences if s.strip()]
         except Exception as e:
             logger.warning(f"NLTK sentence tokenization failed: {e}, using fallback")
             # Fallback: simple split by period
-            sentences = re.split(r'[.!?]+', text)
+            sentences = self._SENTENCE_FALLBACK_RE.split(text)
             return [s.strip() for s in sentences if s.strip()]
+    
+    @classmethod
+    def _get_tokenizer(cls):
+        """Load the Punkt sentence tokenizer once and reuse it"""
+        if cls._tokenizer is None:
+            cls._tokenizer = nltk.data.load('tokenizers/punkt/english.pickle')
+        return cls._tokenizer
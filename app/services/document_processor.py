@@ -5,18 +5,144 @@ Handles extraction of text from PDF, DOCX, and TXT files with full Arabic suppor
 
 import os
 import re
-from typing import Dict, Any, Tuple
+from concurrent.futures import Executor
+from itertools import combinations
+from typing import Dict, Any, List, Optional, Tuple
 from pathlib import Path
 import chardet
 from loguru import logger
 
 # PDF Processing
-import PyPDF2
+import fitz  # PyMuPDF
 import pdfplumber
 
 # DOCX Processing
 from docx import Document as DocxDocument
 
+from app.services.chunking_service import Chunk, ChunkingService
+
+
+# Encoding detection runs on a prefix of the file unless its confidence is low
+ENCODING_SAMPLE_SIZE = 64 * 1024
+ENCODING_MIN_CONFIDENCE = 0.8
+
+# RE2 scans in linear time with a DFA; fall back to the stdlib engine if not installed
+try:
+    import re2 as _scan_re
+except ImportError:
+    _scan_re = re
+
+# Character classes used for language and diacritics detection.
+# Non-raw strings so both engines see literal code points (RE2 has no \u escapes).
+# Arabic Unicode ranges: 0600-06FF, Supplement 0750-077F and the presentation forms
+# FB50-FDFF / FE70-FEFC that PDF text extraction often yields (FEFF is the BOM)
+_CHAR_CLASSES = {
+    'arabic': '\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFC',
+    'english': 'a-zA-Z',
+    # Fatha, Damma, Kasra, Sukun, Shadda, etc. (064B-0652) and Superscript Alef (0670)
+    'diacritics': '\u064B-\u0652\u0670',
+}
+_ENGLISH_RE = _scan_re.compile(f"[{_CHAR_CLASSES['english']}]")
+
+# The diacritics set is small enough to test each code point with str.__contains__,
+# whose single-character search is vectorized in CPython and far outpaces a regex
+_DIACRITIC_CHARS = tuple(chr(cp) for cp in range(0x064B, 0x0653)) + ('\u0670',)
+
+# One pattern per set of classes still unseen, used by _scan_unicode
+_SCAN_RES = {
+    frozenset(names): _scan_re.compile(
+        '[' + ''.join(_CHAR_CLASSES[name] for name in names) + ']'
+    )
+    for size in range(1, len(_CHAR_CLASSES) + 1)
+    for names in combinations(_CHAR_CLASSES, size)
+}
+
+# Language label for each (has_arabic, has_english) pair
+_LANG_TABLE = {
+    (True, True): 'mixed',
+    (True, False): 'arabic',
+    (False, True): 'english',
+    (False, False): 'unknown',
+}
+
+
+def _scan_unicode(text: str, with_diacritics: bool = True) -> Tuple[bool, bool, bool]:
+    """
+    Find Arabic letters, English letters and Arabic diacritics in one pass
+    
+    Each search resumes after the previous hit and only looks for the
+    classes not seen yet, so the text is traversed at most once.
+    
+    Args:
+        text: Input text
+        with_diacritics: Also look for diacritics (reported False otherwise)
+        
+    Returns:
+        Tuple of (has_arabic, has_english, has_diacritics)
+    """
+    # ASCII-only strings are flagged at creation, so this check is O(1)
+    if text.isascii():
+        return False, bool(_ENGLISH_RE.search(text)), False
+    
+    missing = set(_CHAR_CLASSES)
+    if not with_diacritics:
+        missing.discard('diacritics')
+    pos = 0
+    
+    while missing:
+        match = _SCAN_RES[frozenset(missing)].search(text, pos)
+        if match is None:
+            break
+        
+        char = match.group()
+        pos = match.end()
+        if char < '\u0600':
+            missing.discard('english')
+        else:
+            missing.discard('arabic')
+            if '\u064B' <= char <= '\u0652' or char == '\u0670':
+                missing.discard('diacritics')
+    
+    return (
+        'arabic' not in missing,
+        'english' not in missing,
+        with_diacritics and 'diacritics' not in missing
+    )
+
+
+# Words are counted over windows of this many characters to bound memory
+WORD_COUNT_WINDOW = 64 * 1024
+_WHITESPACE_RE = re.compile(r'\s')
+
+
+def _count_words(text: str) -> int:
+    """
+    Count whitespace-separated words without splitting the whole text at once
+    
+    Matches len(text.split()), but only one window's worth of word strings
+    exists at a time, which also keeps the work cache-resident.
+    
+    Args:
+        text: Input text
+        
+    Returns:
+        Number of words
+    """
+    count = 0
+    start = 0
+    length = len(text)
+    
+    while start < length:
+        end = start + WORD_COUNT_WINDOW
+        if end < length:
+            # Extend to the next whitespace so no word straddles two windows
+            match = _WHITESPACE_RE.search(text, end)
+            end = match.start() if match else length
+        count += len(text[start:end].split())
+        start = end
+    
+    return count
+
 
 class DocumentProcessor:
     """Process documents and extract text with metadata"""
@@ -56,13 +182,12 @@ class DocumentProcessor:
         else:
             raise ValueError(f"Unsupported format: {file_extension}")
         
-        # Detect language
-        language = self.detect_language(text)
+        # Detect language and Arabic diacritics in a single scan
+        has_arabic, has_english, has_diacritics = _scan_unicode(text)
+        language = self._classify_language(has_arabic, has_english)
         
-        # Validate Arabic diacritics if Arabic
-        has_diacritics = False
-        if language == 'arabic':
-            has_diacritics = self.validate_arabic_diacritics(text)
+        # Diacritics are only reported for Arabic documents
+        has_diacritics = has_diacritics and language == 'arabic'
         
         # Get file size
         file_size = file_path.stat().st_size
@@ -76,17 +201,41 @@ class DocumentProcessor:
             'page_count': page_count,
             'has_arabic_diacritics': has_diacritics,
             'character_count': len(text),
-            'word_count': len(text.split())
+            'word_count': _count_words(text)
         }
         
         logger.info(f"Extracted {len(text)} characters from {file_path.name}")
         
         return metadata
     
+    def process_files(
+        self,
+        file_paths: List[str],
+        executor: Optional[Executor] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Process several document files in parallel across CPU cores
+        
+        Extraction is CPU-bound, so pass a ProcessPoolExecutor. The caller owns
+        the pool (the API creates one with spawned workers at startup); the
+        processor holds no database clients, so it is safe to send to workers.
+        
+        Args:
+            file_paths: Paths to the document files
+            executor: Pool to run extraction on (processed in this thread if omitted)
+            
+        Returns:
+            List of metadata dictionaries, in the same order as file_paths
+        """
+        if executor is None or len(file_paths) <= 1:
+            return [self.process_file(path) for path in file_paths]
+        
+        return list(executor.map(self.process_file, file_paths))
+    
     def extract_pdf(self, file_path: str) -> Tuple[str, int]:
         """
         Extract text from PDF file
-        Uses PyPDF2 as primary method with pdfplumber as fallback
+        Uses PyMuPDF as primary method with pdfplumber as fallback
         
         Args:
             file_path: Path to PDF file
@@ -98,26 +247,37 @@ class DocumentProcessor:
         page_count = 0
         
         try:
-            # Try PyPDF2 first (faster)
-            with open(file_path, 'rb') as file:
-                pdf_reader = PyPDF2.PdfReader(file)
-                page_count = len(pdf_reader.pages)
-                
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text + "\n"
-            
-            # If PyPDF2 didn't extract much text, try pdfplumber
+            # Try PyMuPDF first (native MuPDF parser, much faster)
+            parts = []
+            image_only_pages = 0
+            with fitz.open(file_path) as doc:
+                page_count = doc.page_count
+                for page in doc:
+                    page_text = page.get_text("text")
+                    parts.append(page_text)
+                    if not page_text.strip() and page.get_images():
+                        image_only_pages += 1
+            text = "\n".join(parts)
+            
             if len(text.strip()) < 100:
-                logger.info("PyPDF2 extraction insufficient, trying pdfplumber...")
-                text = ""
-                with pdfplumber.open(file_path) as pdf:
-                    page_count = len(pdf.pages)
-                    for page in pdf.pages:
-                        page_text = page.extract_text()
-                        if page_text:
-                            text += page_text + "\n"
+                if image_only_pages:
+                    # Scanned pages have no text layer at all, so pdfplumber
+                    # would only spend seconds finding nothing
+                    logger.warning(
+                        f"PDF appears to be scanned ({image_only_pages}/{page_count} image-only pages); "
+                        "OCR is required to extract its text"
+                    )
+                else:
+                    # PyMuPDF missed text that is there, try pdfplumber
+                    logger.info("PyMuPDF extraction insufficient, trying pdfplumber...")
+                    parts = []
+                    with pdfplumber.open(file_path) as pdf:
+                        page_count = len(pdf.pages)
+                        for page in pdf.pages:
+                            page_text = page.extract_text()
+                            if page_text:
+                                parts.append(page_text)
+                    text = "\n".join(parts)
         
         except Exception as e:
             logger.error(f"Error extracting PDF: {e}")
@@ -140,14 +300,16 @@ class DocumentProcessor:
             
             # Extract all paragraphs
             paragraphs = [para.text for para in doc.paragraphs if para.text.strip()]
-            text = "\n".join(paragraphs)
             
             # Also extract text from tables
-            for table in doc.tables:
-                for row in table.rows:
-                    for cell in row.cells:
-                        if cell.text.strip():
-                            text += "\n" + cell.text
+            cell_texts = [
+                cell.text
+                for table in doc.tables
+                for row in table.rows
+                for cell in row.cells
+                if cell.text.strip()
+            ]
+            text = "\n".join(paragraphs + cell_texts)
             
             paragraph_count = len(paragraphs)
             
@@ -169,17 +331,20 @@ class DocumentProcessor:
             Tuple of (extracted_text, line_count)
         """
         try:
-            # Detect encoding
             with open(file_path, 'rb') as file:
                 raw_data = file.read()
-                result = chardet.detect(raw_data)
-                encoding = result['encoding']
             
-            logger.info(f"Detected encoding: {encoding}")
+            # Most files are UTF-8: decode directly and skip detection
+            try:
+                text = raw_data.decode('utf-8-sig')
+            except UnicodeDecodeError:
+                encoding = self._detect_encoding(raw_data)
+                logger.info(f"Detected encoding: {encoding}")
+                text = raw_data.decode(encoding)
             
-            # Read file with detected encoding
-            with open(file_path, 'r', encoding=encoding) as file:
-                text = file.read()
+            # Match text-mode reads, which translate Windows/old Mac newlines
+            if '\r' in text:
+                text = text.replace('\r\n', '\n').replace('\r', '\n')
             
             line_count = len(text.split('\n'))
             
@@ -195,6 +360,24 @@ class DocumentProcessor:
             except:
                 raise
     
+    def _detect_encoding(self, raw_data: bytes) -> str:
+        """
+        Detect text encoding from a bounded sample
+        
+        Args:
+            raw_data: Raw file contents
+            
+        Returns:
+            Encoding name
+        """
+        result = chardet.detect(raw_data[:ENCODING_SAMPLE_SIZE])
+        
+        # Only pay for a full-file pass when the sample is inconclusive
+        if (result['confidence'] or 0) < ENCODING_MIN_CONFIDENCE and len(raw_data) > ENCODING_SAMPLE_SIZE:
+            result = chardet.detect(raw_data)
+        
+        return result['encoding'] or 'utf-8'
+    
     def detect_language(self, text: str) -> str:
         """
         Detect if text contains Arabic characters
@@ -203,23 +386,14 @@ class DocumentProcessor:
             text: Input text
             
         Returns:
-            'arabic', 'english', or 'mixed'
+            'arabic', 'english', 'mixed', or 'unknown'
         """
-        # Arabic Unicode range: 0600-06FF
-        arabic_pattern = re.compile(r'[\u0600-\u06FF]')
-        english_pattern = re.compile(r'[a-zA-Z]')
-        
-        has_arabic = bool(arabic_pattern.search(text))
-        has_english = bool(english_pattern.search(text))
-        
-        if has_arabic and has_english:
-            return 'mixed'
-        elif has_arabic:
-            return 'arabic'
-        elif has_english:
-            return 'english'
-        else:
-            return 'unknown'
+        has_arabic, has_english, _ = _scan_unicode(text, with_diacritics=False)
+        return self._classify_language(has_arabic, has_english)
+    
+    def _classify_language(self, has_arabic: bool, has_english: bool) -> str:
+        """Map detected scripts to a language label"""
+        return _LANG_TABLE[(has_arabic, has_english)]
     
     def validate_arabic_diacritics(self, text: str) -> bool:
         """
@@ -235,5 +409,43 @@ class DocumentProcessor:
         Returns:
             True if diacritics are present, False otherwise
         """
-        diacritics_pattern = re.compile(r'[\u064B-\u0652\u0670]')
-        return bool(diacritics_pattern.search(text))
+        return any(char in text for char in _DIACRITIC_CHARS)
+    
+    def scan_and_chunk(
+        self,
+        text: str,
+        chunking_service: ChunkingService,
+        strategy: str = 'auto'
+    ) -> Tuple[List[Chunk], str, bool]:
+        """
+        Chunk text and detect its language from the chunks in the same pass
+        
+        Each chunk is scanned once and tagged with its own language and
+        diacritics flags; the document-level result is combined from those,
+        so the full text is not scanned separately.
+        
+        Args:
+            text: Text to chunk
+            chunking_service: Service that splits the text
+            strategy: 'fixed', 'dynamic', or 'auto'
+            
+        Returns:
+            Tuple of (chunks, language, has_diacritics)
+        """
+        chunks = chunking_service.chunk_text(text, strategy=strategy)
+        
+        has_arabic = has_english = has_diacritics = False
+        for chunk in chunks:
+            chunk_arabic, chunk_english, chunk_diacritics = _scan_unicode(chunk.text)
+            # Prefixed so they never shadow the document-level 'language' filter field
+            chunk.metadata['chunk_language'] = self._classify_language(chunk_arabic, chunk_english)
+            chunk.metadata['chunk_has_diacritics'] = chunk_diacritics
+            
+            has_arabic |= chunk_arabic
+            has_english |= chunk_english
+            has_diacritics |= chunk_diacritics
+        
+        language = self._classify_language(has_arabic, has_english)
+        
+        # Diacritics are only reported for Arabic documents, as in process_file
+        return chunks, language, has_diacritics and language == 'arabic'
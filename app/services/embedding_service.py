@@ -3,26 +3,48 @@ Embedding Service
 Generates multilingual embeddings for text chunks
 """
 
-from typing import List
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from loguru import logger
 import torch
 
+from app.config import get_settings
+
 
 class EmbeddingService:
     """Generate embeddings using multilingual sentence transformers"""
     
-    def __init__(self, model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
+        cache_size: int = 10000,
+        use_fp16: bool = True
+    ):
         """
         Initialize embedding service
         
         Args:
             model_name: HuggingFace model name for embeddings
+            cache_size: Maximum number of embeddings kept in the LRU cache
+            use_fp16: Run the model in half precision when on GPU
         """
         self.model_name = model_name
+        self.use_fp16 = use_fp16
         self.model = None
         self.embedding_dimension = 384  # For the default model
         
+        # LRU cache of fp16 vectors keyed by content hash
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        
         logger.info(f"Initializing embedding model: {model_name}")
         self._load_model()
     
@@ -32,12 +54,24 @@ class EmbeddingService:
             # Use GPU if available
             device = 'cuda' if torch.cuda.is_available() else 'cpu'
             self.model = SentenceTransformer(self.model_name, device=device)
-            logger.info(f"Model loaded successfully on {device}")
+            self.model.eval()
+            
+            # Half precision halves weight/activation bandwidth on GPU; CPUs
+            # without native fp16/bf16 matmul would run slower, so stay fp32 there
+            precision = 'fp32'
+            if device == 'cuda' and self.use_fp16:
+                self.model.half()
+                precision = 'fp16'
+            elif device == 'cuda':
+                # Let fp32 matmuls use TF32 tensor cores on Ampere and newer
+                torch.backends.cuda.matmul.allow_tf32 = True
+            
+            logger.info(f"Model loaded successfully on {device} ({precision})")
         except Exception as e:
             logger.error(f"Error loading model: {e}")
             raise
     
-    def generate_embedding(self, text: str) -> List[float]:
+    def generate_embedding(self, text: str) -> np.ndarray:
         """
         Generate embedding for a single text
         
@@ -45,44 +79,183 @@ class EmbeddingService:
             text: Input text
             
         Returns:
-            List of floats representing the embedding vector
+            Float32 embedding vector of shape (embedding_dimension,)
         """
         if not self.model:
             raise RuntimeError("Model not loaded")
         
+        key = self._hash_text(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached.astype(np.float32)
+        
         try:
-            embedding = self.model.encode(text, convert_to_tensor=False)
-            return embedding.tolist()
+            embedding = self._encode([text])[0]
+            self._cache_put(key, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Error generating embedding: {e}")
             raise
     
-    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+    def generate_embeddings_batch(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
         """
         Generate embeddings for multiple texts in batches
         
+        Only texts missing from the cache are sent to the model.
+        
         Args:
             texts: List of input texts
             batch_size: Batch size for processing
             
         Returns:
-            List of embedding vectors
+            Float32 array of shape (len(texts), embedding_dimension)
         """
         if not self.model:
             raise RuntimeError("Model not loaded")
+        if not texts:
+            return np.empty((0, self.embedding_dimension), dtype=np.float32)
+        
+        keys = [self._hash_text(text) for text in texts]
+        results = [self._cache_get(key) for key in keys]
+        
+        # Group cache misses by key so repeated texts are encoded only once
+        pending: Dict[bytes, List[int]] = {}
+        for i, cached in enumerate(results):
+            if cached is None:
+                pending.setdefault(keys[i], []).append(i)
         
         try:
+            if pending:
+                # encode() sorts its input by length internally, so batches are
+                # already padded to similar lengths
+                embeddings = self._encode(
+                    [texts[indices[0]] for indices in pending.values()],
+                    batch_size=batch_size
+                )
+                for (key, indices), embedding in zip(pending.items(), embeddings):
+                    self._cache_put(key, embedding)
+                    for i in indices:
+                        results[i] = embedding
+            
+            logger.debug(f"Encoded {len(pending)} unique texts for a batch of {len(texts)}")
+            # Cached rows are fp16; stacking widens everything to one float32 matrix
+            return np.vstack(results).astype(np.float32, copy=False)
+        except Exception as e:
+            logger.error(f"Error generating batch embeddings: {e}")
+            raise
+    
+    def _encode(
+        self,
+        texts: List[str],
+        batch_size: int = 32,
+        show_progress_bar: bool = False
+    ) -> np.ndarray:
+        """
+        Run texts through the model
+        
+        Embeddings stay on the device until the whole batch is done and are
+        then copied to the host once, instead of once per batch.
+        
+        Args:
+            texts: Input texts
+            batch_size: Batch size for processing
+            show_progress_bar: Show a progress bar while encoding
+            
+        Returns:
+            Float32 array of shape (len(texts), embedding_dimension)
+        """
+        with torch.inference_mode():
             embeddings = self.model.encode(
                 texts,
                 batch_size=batch_size,
-                show_progress_bar=True,
-                convert_to_tensor=False
+                show_progress_bar=show_progress_bar,
+                convert_to_tensor=True
             )
-            return embeddings.tolist()
-        except Exception as e:
-            logger.error(f"Error generating batch embeddings: {e}")
-            raise
+        return embeddings.float().cpu().numpy()
+    
+    def warmup(self, batch_size: int = 8):
+        """
+        Run a dummy batch through the model so lazy initialization
+        (weights, kernels) happens before real traffic arrives
+        
+        Args:
+            batch_size: Number of dummy texts to encode
+        """
+        if not self.model:
+            raise RuntimeError("Model not loaded")
+        
+        self._encode(["warmup"] * batch_size, batch_size=batch_size)
+        logger.info("Embedding model warmed up")
+    
+    def get_cached_embedding(self, text: str) -> Optional[np.ndarray]:
+        """
+        Look up a text's embedding without running the model
+        
+        Does not count towards the hit rate: callers fall back to an encode
+        call on a miss, which records the lookup itself.
+        
+        Args:
+            text: Input text
+            
+        Returns:
+            Embedding vector, or None if it is not cached
+        """
+        cached = self._cache_get(self._hash_text(text), count=False)
+        return None if cached is None else cached.astype(np.float32)
+    
+    def clear_cache(self):
+        """Drop all cached embeddings"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def cache_hit_rate(self) -> float:
+        """Fraction of embedding lookups served from the cache"""
+        total = self.cache_hits + self.cache_misses
+        return self.cache_hits / total if total else 0.0
+    
+    def _hash_text(self, text: str) -> bytes:
+        """Hash whitespace-normalized text into a cache key"""
+        normalized = ' '.join(text.split())
+        return hashlib.blake2b(normalized.encode('utf-8'), digest_size=16).digest()
+    
+    def _cache_get(self, key: bytes, count: bool = True):
+        """Look up a cached embedding, marking it as recently used"""
+        with self._cache_lock:
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+            if count and embedding is not None:
+                self.cache_hits += 1
+            elif count:
+                self.cache_misses += 1
+            return embedding
+    
+    def _cache_put(self, key: bytes, embedding):
+        """Store an embedding as fp16, evicting the least recently used entry"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = np.asarray(embedding, dtype=np.float16)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
     
     def get_embedding_dimension(self) -> int:
         """Get the dimension of embeddings"""
         return self.embedding_dimension
+
+
+@lru_cache(maxsize=1)
+def get_shared_embedding_service() -> EmbeddingService:
+    """
+    Get the process-wide embedding service, loading the model on first use
+    
+    Returns:
+        EmbeddingService configured from settings
+    """
+    settings = get_settings()
+    return EmbeddingService(
+        model_name=settings.embedding_model,
+        cache_size=settings.embedding_cache_size,
+        use_fp16=settings.embedding_fp16
+    )
@@ -5,25 +5,50 @@ Implements retrieval-augmented generation capabilities
 
 from typing import List, Dict, Any, Optional
 import time
+import numpy as np
 from loguru import logger
 
-from app.services.storage_service import StorageService
-from app.services.embedding_service import EmbeddingService
+from app.services.storage_service import StorageService, get_shared_storage_service
+from app.services.embedding_service import EmbeddingService, get_shared_embedding_service
+from app.services.semantic_cache import SemanticCache
+from app.config import Settings, get_settings
 
 
 class RAGService:
     """RAG system for document querying and retrieval"""
     
-    def __init__(self):
-        self.storage = StorageService()
-        self.embedding_service = EmbeddingService()
+    def __init__(
+        self,
+        storage: Optional[StorageService] = None,
+        embedding_service: Optional[EmbeddingService] = None,
+        settings: Optional[Settings] = None
+    ):
+        """
+        Initialize RAG service
+        
+        Args:
+            storage: Storage service (defaults to the shared instance)
+            embedding_service: Embedding service (defaults to the shared instance)
+            settings: Settings providing semantic cache configuration (defaults to get_settings())
+        """
+        settings = settings or get_settings()
+        self.storage = storage or get_shared_storage_service()
+        self.embedding_service = embedding_service or get_shared_embedding_service()
+        self.semantic_cache = SemanticCache(
+            dimension=self.embedding_service.get_embedding_dimension(),
+            threshold=settings.semantic_cache_threshold,
+            ttl_seconds=settings.semantic_cache_ttl,
+            capacity=settings.semantic_cache_size
+        )
         logger.info("RAG service initialized")
     
     def semantic_search(
         self,
         query: str,
         top_k: int = 5,
-        document_id: Optional[str] = None
+        document_id: Optional[str] = None,
+        query_embedding: Optional[np.ndarray] = None,
+        language: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Perform semantic search on documents
@@ -32,67 +57,127 @@ class RAGService:
             query: Search query
             top_k: Number of results to return
             document_id: Optional filter by document ID
+            query_embedding: Precomputed embedding of the query (computed if omitted)
+            language: Optional filter by document language
             
         Returns:
             Search results with metadata
         """
+        if query_embedding is None:
+            query_embedding = self.embedding_service.generate_embedding(query)
+        
+        return self.semantic_search_many(
+            [query],
+            [query_embedding],
+            top_k=top_k,
+            document_id=document_id,
+            language=language
+        )[0]
+    
+    def semantic_search_many(
+        self,
+        queries: List[str],
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Perform semantic search for several queries sharing the same filters
+        
+        Queries missing from the semantic cache go to the vector database in
+        one call, and their chunks are fetched from SQL in one query.
+        
+        Args:
+            queries: Search queries
+            query_embeddings: One embedding per query
+            top_k: Number of results to return per query
+            document_id: Optional filter by document ID
+            language: Optional filter by document language
+            
+        Returns:
+            Search results with metadata, one per query
+        """
         start_time = time.time()
         
         try:
-            # Generate query embedding
-            query_embedding = self.embedding_service.generate_embedding(query)
-            
-            # Search in vector database
-            vector_results = self.storage.search_similar_chunks(
-                query_embedding=query_embedding,
-                top_k=top_k,
-                document_id=document_id
-            )
+            # Reuse results of near-identical earlier queries. The storage generation
+            # is read before searching, so entries cached before an upload or delete
+            # (or while one is in flight) are never served afterwards
+            cache_scope = (top_k, document_id, language, self.storage.generation)
+            responses: List[Optional[Dict[str, Any]]] = [
+                self.semantic_cache.lookup(embedding, scope=cache_scope)
+                for embedding in query_embeddings
+            ]
+            misses = [i for i, response in enumerate(responses) if response is None]
             
-            # Get chunk details from SQL database
-            chunk_ids = vector_results['ids'][0] if vector_results['ids'] else []
-            
-            if not chunk_ids:
-                return {
-                    'query': query,
-                    'results': [],
-                    'total_results': 0,
-                    'processing_time': time.time() - start_time
-                }
+            vector_results = {'ids': [], 'distances': []}
+            if misses:
+                # Search in vector database
+                vector_results = self.storage.search_similar_chunks_many(
+                    query_embeddings=np.asarray([query_embeddings[i] for i in misses]),
+                    top_k=top_k,
+                    document_id=document_id,
+                    language=language
+                )
             
-            chunks = self.storage.get_chunk_details(chunk_ids)
+            # Older vectors may lack the language field until the storage backfill
+            # has run; the vector search then ignores the filter and it is applied here
+            post_filter_language = language if not self.storage.vector_languages_ready else None
+            hit_ids = vector_results['ids'] or [[] for _ in misses]
+            hit_distances = vector_results['distances'] or [[] for _ in misses]
             
-            # Build results
-            results = []
-            distances = vector_results['distances'][0] if vector_results['distances'] else []
+            # Fetch chunks and their documents for all queries in one round-trip
+            all_chunk_ids = list(dict.fromkeys(
+                chunk_id for chunk_ids in hit_ids for chunk_id in chunk_ids
+            ))
+            rows = self.storage.get_chunks_with_documents(all_chunk_ids) if all_chunk_ids else []
+            row_by_id = {str(chunk.id): (chunk, document) for chunk, document in rows}
             
-            for i, chunk in enumerate(chunks):
-                # Convert distance to similarity score (1 - normalized distance)
-                similarity_score = 1.0 - (distances[i] if i < len(distances) else 1.0)
+            for i, chunk_ids, distances in zip(misses, hit_ids, hit_distances):
+                # Build results in similarity order
+                results = []
+                for chunk_id, distance in zip(chunk_ids, distances):
+                    if chunk_id not in row_by_id:
+                        continue
+                    chunk, document = row_by_id[chunk_id]
+                    if post_filter_language and document.language != post_filter_language:
+                        continue
+                    
+                    # Convert distance to similarity score (1 - normalized distance)
+                    similarity_score = 1.0 - distance
+                    
+                    result = {
+                        'chunk_id': str(chunk.id),
+                        'document_id': str(chunk.document_id),
+                        'document_name': document.filename,
+                        'chunk_text': chunk.chunk_text,
+                        'similarity_score': round(similarity_score, 4),
+                        'chunk_index': chunk.chunk_index
+                    }
+                    results.append(result)
                 
-                # Get document info
-                document = self.storage.get_document(chunk.document_id)
-                
-                result = {
-                    'chunk_id': chunk.id,
-                    'document_id': chunk.document_id,
-                    'document_name': document.filename if document else 'Unknown',
-                    'chunk_text': chunk.chunk_text,
-                    'similarity_score': round(similarity_score, 4),
-                    'chunk_index': chunk.chunk_index
+                responses[i] = {
+                    'query': queries[i],
+                    'results': results,
+                    'total_results': len(results),
+                    'processing_time': 0.0
                 }
-                results.append(result)
+                # Not cached when empty: an empty result goes stale as soon as documents are added
+                if results:
+                    self.semantic_cache.insert(query_embeddings[i], responses[i], scope=cache_scope)
             
-            processing_time = time.time() - start_time
+            processing_time = round(time.time() - start_time, 3)
+            for query, response in zip(queries, responses):
+                response['query'] = query
+                response['processing_time'] = processing_time
             
-            logger.info(f"Search completed in {processing_time:.2f}s, found {len(results)} results")
+            logger.info(
+                f"Search completed in {processing_time:.2f}s for {len(queries)} queries "
+                f"({len(queries) - len(misses)} served from cache)"
+            )
             
-            return {
-                'query': query,
-                'results': results,
-                'total_results': len(results),
-                'processing_time': round(processing_time, 3)
-            }
+            return responses
         
         except Exception as e:
             logger.error(f"Error in semantic search: {e}")
@@ -102,7 +187,8 @@ class RAGService:
         self,
         query: str,
         top_k: int = 5,
-        filters: Optional[Dict[str, Any]] = None
+        filters: Optional[Dict[str, Any]] = None,
+        query_embedding: Optional[np.ndarray] = None
     ) -> Dict[str, Any]:
         """
         Hybrid search combining vector similarity and metadata filtering
@@ -111,30 +197,22 @@ class RAGService:
             query: Search query
             top_k: Number of results
             filters: Metadata filters (language, document_id, etc.)
+            query_embedding: Precomputed embedding of the query (computed if omitted)
             
         Returns:
             Search results
         """
-        # Extract document_id from filters if present
-        document_id = filters.get('document_id') if filters else None
-        
-        # Perform semantic search
-        results = self.semantic_search(query, top_k, document_id)
-        
-        # Apply additional filters if needed
-        if filters and 'language' in filters:
-            language_filter = filters['language']
-            filtered_results = []
-            
-            for result in results['results']:
-                doc = self.storage.get_document(result['document_id'])
-                if doc and doc.language == language_filter:
-                    filtered_results.append(result)
-            
-            results['results'] = filtered_results
-            results['total_results'] = len(filtered_results)
+        filters = filters or {}
         
-        return results
+        # Filters are applied inside the vector search, so top_k is met after
+        # filtering (language falls back to a post-filter until vectors are backfilled)
+        return self.semantic_search(
+            query,
+            top_k,
+            document_id=filters.get('document_id'),
+            query_embedding=query_embedding,
+            language=filters.get('language')
+        )
     
     def get_context_for_query(
         self,
@@ -153,7 +231,18 @@ class RAGService:
             Concatenated context string
         """
         results = self.semantic_search(query, top_k)
+        return self.build_context(results)
+    
+    def build_context(self, results: Dict[str, Any]) -> str:
+        """
+        Concatenate search results into a context string for an LLM
         
+        Args:
+            results: Output of semantic_search
+            
+        Returns:
+            Concatenated context string
+        """
         context_parts = []
         for i, result in enumerate(results['results'], 1):
             context_parts.append(f"[Context {i}]")
@@ -0,0 +1,154 @@
+"""
+Search Batcher
+Coalesces concurrent search requests into shared vector database queries
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional, Set, Tuple
+import numpy as np
+from loguru import logger
+
+from app.services.rag_service import RAGService
+
+
+class SearchBatcher:
+    """Dynamic batching front-end for RAGService.semantic_search_many"""
+
+    def __init__(
+        self,
+        rag_service: RAGService,
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5
+    ):
+        """
+        Initialize search batcher
+
+        Args:
+            rag_service: Service that runs the searches
+            max_batch_size: Number of queued searches that triggers an immediate run
+            max_wait_ms: How long to wait for more searches before running a batch
+        """
+        self.rag_service = rag_service
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+
+        self._queue: "asyncio.Queue[Tuple[str, np.ndarray, tuple, asyncio.Future]]" = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        # Group searches still running, so a slow one never holds up the queue
+        self._in_flight: Set[asyncio.Task] = set()
+
+    def start(self):
+        """Start the background batching task (requires a running event loop)"""
+        if self._worker is None:
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+            logger.info("Search batcher started")
+
+    async def stop(self):
+        """Stop the background task, failing any searches still queued or running"""
+        if self._worker is None:
+            return
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        for task in self._in_flight:
+            task.cancel()
+        await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+        while not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Search batcher stopped"))
+
+    async def search(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a semantic search, sharing a vector database call with other callers
+
+        Args:
+            query: Search query
+            query_embedding: Embedding of the query
+            top_k: Number of results to return
+            document_id: Optional filter by document ID
+            language: Optional filter by document language
+
+        Returns:
+            Search results with metadata
+        """
+        if self._worker is None:
+            raise RuntimeError("Search batcher not started")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, query_embedding, (top_k, document_id, language), future))
+        return await future
+
+    async def _run(self):
+        """Collect queued searches into batches and run them per filter scope"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            requests = [await self._queue.get()]
+
+            # Keep collecting until the batch is full or the wait window closes
+            deadline = loop.time() + self.max_wait
+            while len(requests) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                requests.append(request)
+
+            # One vector query can only carry one top_k and one filter
+            groups: Dict[tuple, List[tuple]] = {}
+            for request in requests:
+                groups.setdefault(request[2], []).append(request)
+
+            # Run groups in the background and go straight back to collecting
+            for scope, group in groups.items():
+                task = loop.create_task(self._run_group(scope, group))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+            if len(requests) > 1:
+                logger.debug(f"Batched {len(requests)} searches into {len(groups)} queries")
+
+    async def _run_group(self, scope: tuple, group: List[tuple]):
+        """Run one batch of searches that share top_k and filters"""
+        top_k, document_id, language = scope
+        try:
+            responses = await asyncio.to_thread(
+                self.rag_service.semantic_search_many,
+                [query for query, *_ in group],
+                np.asarray([embedding for _, embedding, *_ in group]),
+                top_k=top_k,
+                document_id=document_id,
+                language=language
+            )
+        except asyncio.CancelledError:
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(RuntimeError("Search batcher stopped"))
+            raise
+        except Exception as e:
+            logger.error(f"Error in batched search: {e}")
+            for *_, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (*_, future), response in zip(group, responses):
+            if not future.done():
+                future.set_result(response)
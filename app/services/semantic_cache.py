@@ -0,0 +1,156 @@
+"""
+Semantic Cache
+Reuses search results for queries whose embeddings are near-duplicates
+"""
+
+import copy
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Set
+import numpy as np
+from loguru import logger
+
+
+class SemanticCache:
+    """Similarity-keyed cache of query results with TTL and LRU eviction"""
+
+    def __init__(
+        self,
+        dimension: int = 384,
+        threshold: float = 0.95,
+        ttl_seconds: float = 300,
+        capacity: int = 1024
+    ):
+        """
+        Initialize semantic cache
+
+        Args:
+            dimension: Embedding dimension
+            threshold: Minimum cosine similarity for a cache hit
+            ttl_seconds: Maximum age of a cached entry
+            capacity: Maximum number of cached entries
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+
+        # Fixed-size slot buffer: normalized vectors plus per-slot bookkeeping.
+        # Kept in float32 so lookups run as a BLAS matvec; numpy's integer
+        # matmul has no BLAS path and is ~10x slower at this size
+        self._vectors = np.zeros((capacity, dimension), dtype=np.float32)
+        self._values: list = [None] * capacity
+        self._scopes: list = [None] * capacity
+        # Slots holding each scope, so lookups only score their own scope's slots
+        self._scope_slots: Dict[Hashable, Set[int]] = {}
+        self._created = np.zeros(capacity, dtype=np.float64)
+        self._last_used = np.zeros(capacity, dtype=np.float64)
+        self._occupied = np.zeros(capacity, dtype=bool)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, embedding, scope: Hashable = None) -> Optional[Dict[str, Any]]:
+        """
+        Find a cached result for a similar query
+
+        Args:
+            embedding: Query embedding vector
+            scope: Extra key that must match exactly (e.g. top_k and filters)
+
+        Returns:
+            Copy of the cached result, or None on a miss
+        """
+        if self.capacity <= 0:
+            return None
+
+        vector = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            slots = self._scope_slots.get(scope)
+            if slots:
+                candidates = np.fromiter(slots, dtype=np.intp, count=len(slots))
+                candidates = candidates[now - self._created[candidates] < self.ttl_seconds]
+            else:
+                candidates = np.empty(0, dtype=np.intp)
+
+            if not candidates.size:
+                self.misses += 1
+                return None
+
+            # Inner product of unit vectors is cosine similarity
+            scores = self._vectors[candidates] @ vector
+            best_index = int(np.argmax(scores))
+            best = int(candidates[best_index])
+
+            if scores[best_index] < self.threshold:
+                self.misses += 1
+                return None
+
+            self._last_used[best] = now
+            self.hits += 1
+            logger.debug(f"Semantic cache hit (similarity {scores[best_index]:.3f})")
+            return copy.deepcopy(self._values[best])
+
+    def insert(self, embedding, value: Dict[str, Any], scope: Hashable = None):
+        """
+        Cache a result for a query embedding
+
+        Args:
+            embedding: Query embedding vector
+            value: Result to cache
+            scope: Extra key that must match exactly on lookup
+        """
+        if self.capacity <= 0:
+            return
+
+        vector = self._normalize(embedding)
+        now = time.time()
+
+        with self._lock:
+            # Reuse a free slot, otherwise evict the least recently used one
+            free = np.flatnonzero(~self._occupied)
+            slot = int(free[0]) if free.size else int(np.argmin(self._last_used))
+
+            if self._occupied[slot]:
+                self._release_scope(slot)
+
+            self._vectors[slot] = vector
+            self._values[slot] = copy.deepcopy(value)
+            self._scopes[slot] = scope
+            self._scope_slots.setdefault(scope, set()).add(slot)
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._occupied[slot] = True
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._occupied[:] = False
+            self._values = [None] * self.capacity
+            self._scopes = [None] * self.capacity
+            self._scope_slots = {}
+
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def _release_scope(self, slot: int):
+        """Remove a slot from its scope's index before it is reused"""
+        scope = self._scopes[slot]
+        slots = self._scope_slots.get(scope)
+        if slots is None:
+            return
+        slots.discard(slot)
+        if not slots:
+            # Scopes include the storage generation, so drop stale ones entirely
+            del self._scope_slots[scope]
+
+    def _normalize(self, embedding) -> np.ndarray:
+        """L2-normalize an embedding to float32"""
+        vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
@@ -3,25 +3,55 @@ Storage Service
 Manages dual storage: PostgreSQL (metadata) + ChromaDB (vectors)
 """
 
-from typing import List, Dict, Any, Optional
-from sqlalchemy import create_engine
+import csv
+import io
+import json
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+from sqlalchemy import create_engine, delete, insert
 from sqlalchemy.orm import sessionmaker, Session
 import chromadb
-from chromadb.config import Settings
 from loguru import logger
 import uuid
+import numpy as np
 
-from app.models.document import Base, Document, Chunk
-from app.config import settings
+from app.models.document import Document, Chunk
+from app.config import Settings, get_settings
+from app.migrations import run_migrations
+
+
+# Chunk batches at least this large are written with COPY instead of INSERT
+COPY_MIN_ROWS = 10000
+
+
+def as_uuid(value) -> Optional[uuid.UUID]:
+    """Convert an ID to uuid.UUID, returning None if it is not a valid UUID"""
+    if isinstance(value, uuid.UUID):
+        return value
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        return None
 
 
 class StorageService:
     """Dual storage management for SQL and Vector databases"""
     
-    def __init__(self):
+    def __init__(self, settings: Optional[Settings] = None):
+        """
+        Initialize storage service
+        
+        Args:
+            settings: Settings providing database and vector store configuration (defaults to get_settings())
+        """
+        settings = settings or get_settings()
+        
         # PostgreSQL setup
         self.engine = create_engine(settings.database_url)
-        Base.metadata.create_all(self.engine)
+        # Schema is owned by Alembic so existing tables get altered, not skipped
+        run_migrations(self.engine)
         self.SessionLocal = sessionmaker(bind=self.engine)
         
         # ChromaDB setup
@@ -35,12 +65,50 @@ class StorageService:
             metadata={"description": "Document chunks with embeddings"}
         )
         
+        # Vectors stored before they carried the document language get it added
+        # once; until that has succeeded, language filters run after the search
+        self.vector_languages_ready = False
+        self._backfill_vector_languages()
+        
+        # Bumped after every committed change to searchable content, so
+        # callers caching search results can tell when they went stale
+        self.generation = 0
+        self._generation_lock = threading.Lock()
+        
         logger.info("Storage service initialized successfully")
     
+    def _bump_generation(self):
+        """Mark previously returned search results as stale"""
+        with self._generation_lock:
+            self.generation += 1
+    
     def get_db_session(self) -> Session:
         """Get database session"""
         return self.SessionLocal()
     
+    @contextmanager
+    def session_scope(self) -> Iterator[Session]:
+        """
+        Provide a transactional session around a series of operations
+        
+        Commits when the block exits normally, rolls back if it raises,
+        and always closes the session.
+        """
+        db = self.get_db_session()
+        try:
+            yield db
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+    
+    def close(self):
+        """Close pooled database connections (the pool reopens on next use)"""
+        self.engine.dispose()
+        logger.info("Storage service connections closed")
+    
     def store_document(
         self,
         filename: str,
@@ -57,39 +125,33 @@ class StorageService:
         Returns:
             Document ID
         """
-        db = self.get_db_session()
-        
         try:
-            document = Document(
-                id=str(uuid.uuid4()),
-                filename=filename,
-                file_type=file_type,
-                file_size=file_size,
-                language=language,
-                chunking_strategy=chunking_strategy,
-                total_chunks=total_chunks,
-                doc_metadata=metadata or {}
-            )
+            document_id = uuid.uuid4()
+            with self.session_scope() as db:
+                db.add(Document(
+                    id=document_id,
+                    filename=filename,
+                    file_type=file_type,
+                    file_size=file_size,
+                    language=language,
+                    chunking_strategy=chunking_strategy,
+                    total_chunks=total_chunks,
+                    doc_metadata=metadata or {}
+                ))
             
-            db.add(document)
-            db.commit()
-            db.refresh(document)
-            
-            logger.info(f"Stored document: {document.id}")
-            return document.id
+            logger.info(f"Stored document: {document_id}")
+            return str(document_id)
         
         except Exception as e:
-            db.rollback()
             logger.error(f"Error storing document: {e}")
             raise
-        finally:
-            db.close()
     
     def store_chunks(
         self,
         document_id: str,
         chunks: List[Dict[str, Any]],
-        embeddings: List[List[float]]
+        embeddings: np.ndarray,
+        language: Optional[str] = None
     ):
         """
         Store chunks in both PostgreSQL and ChromaDB
@@ -98,58 +160,277 @@ class StorageService:
             document_id: Parent document ID
             chunks: List of chunk dictionaries
             embeddings: List of embedding vectors
+            language: Document language, stored with each vector for filtering
         """
-        db = self.get_db_session()
-        
         try:
             # Store in PostgreSQL
-            chunk_ids = []
-            for chunk_data in chunks:
-                chunk = Chunk(
-                    id=str(uuid.uuid4()),
-                    document_id=document_id,
-                    chunk_index=chunk_data['index'],
-                    chunk_text=chunk_data['text'],
-                    chunk_size=len(chunk_data['text']),
-                    chunk_metadata=chunk_data.get('metadata', {})
-                )
-                db.add(chunk)
-                chunk_ids.append(chunk.id)
-            
-            db.commit()
+            with self.session_scope() as db:
+                chunk_ids = self._insert_chunks(db, document_id, chunks)
             
             # Store in ChromaDB
-            self.collection.add(
-                ids=chunk_ids,
-                embeddings=embeddings,
-                documents=[chunk['text'] for chunk in chunks],
-                metadatas=[
-                    {
-                        'document_id': document_id,
-                        'chunk_index': chunk['index'],
-                        **chunk.get('metadata', {})
-                    }
-                    for chunk in chunks
-                ]
-            )
+            self._add_vectors(document_id, chunk_ids, chunks, embeddings, language)
+            self._bump_generation()
             
             logger.info(f"Stored {len(chunks)} chunks for document {document_id}")
         
         except Exception as e:
-            db.rollback()
             logger.error(f"Error storing chunks: {e}")
             raise
+    
+    def store_document_with_chunks(
+        self,
+        filename: str,
+        file_type: str,
+        file_size: int,
+        language: str,
+        chunking_strategy: str,
+        chunks: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        content_hash: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Store a document and its chunks in a single transaction
+        
+        The SQL transaction is committed only after the vectors are added to
+        ChromaDB, and the vectors are deleted again if the commit fails, so a
+        failure at any step leaves no partial document behind.
+        
+        Args:
+            filename: Original filename
+            file_type: File extension without dot
+            file_size: File size in bytes
+            language: Detected language
+            chunking_strategy: Strategy used to chunk the document
+            chunks: List of chunk dictionaries
+            embeddings: List of embedding vectors
+            content_hash: Fingerprint of the original file bytes
+            metadata: Extra document metadata
+            
+        Returns:
+            Document ID
+        """
+        try:
+            document_id = uuid.uuid4()
+            vectors_added = False
+            try:
+                with self.session_scope() as db:
+                    db.add(Document(
+                        id=document_id,
+                        filename=filename,
+                        file_type=file_type,
+                        file_size=file_size,
+                        language=language,
+                        chunking_strategy=chunking_strategy,
+                        total_chunks=len(chunks),
+                        content_hash=content_hash,
+                        doc_metadata=metadata or {}
+                    ))
+                    db.flush()
+                    
+                    chunk_ids = self._insert_chunks(db, document_id, chunks)
+                    self._add_vectors(document_id, chunk_ids, chunks, embeddings, language)
+                    vectors_added = True
+            except Exception:
+                # The commit failed after the vectors went in; remove them so
+                # searches never return chunk IDs without rows
+                if vectors_added:
+                    self._delete_vectors(document_id)
+                raise
+            self._bump_generation()
+            
+            logger.info(f"Stored document {document_id} with {len(chunks)} chunks")
+            return str(document_id)
+        
+        except Exception as e:
+            logger.error(f"Error storing document: {e}")
+            raise
+    
+    def _insert_chunks(self, db: Session, document_id, chunks: List[Dict[str, Any]]) -> List[str]:
+        """
+        Insert chunk rows with a single bulk INSERT, or COPY for large batches
+        
+        Returns:
+            Generated chunk IDs in input order
+        """
+        document_id = as_uuid(document_id)
+        rows = [
+            {
+                'id': uuid.uuid4(),
+                'document_id': document_id,
+                'chunk_index': chunk_data['index'],
+                'chunk_text': chunk_data['text'],
+                'chunk_size': len(chunk_data['text']),
+                'chunk_metadata': chunk_data.get('metadata', {})
+            }
+            for chunk_data in chunks
+        ]
+        if len(rows) >= COPY_MIN_ROWS and db.get_bind().dialect.name == 'postgresql':
+            self._copy_chunks(db, rows)
+        elif rows:
+            db.execute(insert(Chunk), rows)
+        return [str(row['id']) for row in rows]
+    
+    def _copy_chunks(self, db: Session, rows: List[Dict[str, Any]]):
+        """Stream chunk rows into PostgreSQL with COPY inside the session's transaction"""
+        buffer = io.StringIO()
+        # Quote every field so empty strings are not read back as NULL
+        writer = csv.writer(buffer, quoting=csv.QUOTE_ALL)
+        for row in rows:
+            writer.writerow([
+                row['id'],
+                row['document_id'],
+                row['chunk_index'],
+                row['chunk_text'],
+                row['chunk_size'],
+                json.dumps(row['chunk_metadata'], ensure_ascii=False)
+            ])
+        buffer.seek(0)
+        
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                "COPY chunks (id, document_id, chunk_index, chunk_text, chunk_size, chunk_metadata) "
+                "FROM STDIN WITH (FORMAT csv)",
+                buffer
+            )
         finally:
-            db.close()
+            cursor.close()
     
-    def get_document(self, document_id: str) -> Optional[Document]:
+    def _add_vectors(
+        self,
+        document_id,
+        chunk_ids: List[str],
+        chunks: List[Dict[str, Any]],
+        embeddings: np.ndarray,
+        language: Optional[str] = None
+    ):
+        """
+        Add chunk embeddings to ChromaDB
+        
+        Chunk text lives in PostgreSQL only; storing it in ChromaDB as well
+        would duplicate every chunk without ever being read back.
+        
+        Vectors are not quantized here: ChromaDB's HNSW index keeps float32
+        internally, so fp16/int8 input would be widened back on insert and
+        only cost recall.
+        """
+        if not chunk_ids:
+            return
+        
+        # Document-level fields go in every vector's metadata so searches can filter on them
+        document_fields = {'document_id': str(document_id)}
+        if language:
+            document_fields['language'] = language
+        
+        self.collection.add(
+            ids=chunk_ids,
+            # ChromaDB validates plain lists, so convert once at the boundary
+            embeddings=np.asarray(embeddings, dtype=np.float32).tolist(),
+            metadatas=[
+                {
+                    **chunk.get('metadata', {}),
+                    'chunk_index': chunk['index'],
+                    # Last, so chunk metadata cannot override the filter fields
+                    **document_fields
+                }
+                for chunk in chunks
+            ]
+        )
+    
+    def _backfill_vector_languages(self, batch_size: int = 1000):
+        """
+        Add each document's language to its vectors stored without one
+        
+        Runs once per collection: completion is recorded in the collection
+        metadata. A failure is logged and leaves vector_languages_ready unset.
+        
+        Args:
+            batch_size: Vectors read and updated per ChromaDB call
+        """
+        collection_metadata = self.collection.metadata or {}
+        if collection_metadata.get('language_backfilled'):
+            self.vector_languages_ready = True
+            return
+        
+        try:
+            missing: Dict[str, Dict[str, Any]] = {}
+            offset = 0
+            while True:
+                page = self.collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+                for chunk_id, metadata in zip(page['ids'], page['metadatas']):
+                    if metadata and 'language' not in metadata and 'document_id' in metadata:
+                        missing[chunk_id] = metadata
+                if len(page['ids']) < batch_size:
+                    break
+                offset += batch_size
+            
+            document_ids = {as_uuid(metadata['document_id']) for metadata in missing.values()} - {None}
+            languages = {}
+            if document_ids:
+                db = self.get_db_session()
+                try:
+                    rows = db.query(Document.id, Document.language).filter(Document.id.in_(document_ids)).all()
+                finally:
+                    db.close()
+                languages = {str(doc_id): language for doc_id, language in rows}
+            
+            # Vectors whose document no longer exists are left as they are
+            updates = [
+                (chunk_id, {**metadata, 'language': languages[str(as_uuid(metadata['document_id']))]})
+                for chunk_id, metadata in missing.items()
+                if str(as_uuid(metadata['document_id'])) in languages
+            ]
+            for start in range(0, len(updates), batch_size):
+                batch = updates[start:start + batch_size]
+                self.collection.update(
+                    ids=[chunk_id for chunk_id, _ in batch],
+                    metadatas=[metadata for _, metadata in batch]
+                )
+            
+            self.collection.modify(metadata={**collection_metadata, 'language_backfilled': True})
+            self.vector_languages_ready = True
+            logger.info(f"Backfilled language on {len(updates)} stored vectors")
+        
+        except Exception as e:
+            logger.error(f"Error backfilling vector languages, filtering by language after search: {e}")
+    
+    def _delete_vectors(self, document_id):
+        """Remove a document's vectors after a failed store, logging rather than masking the original error"""
+        try:
+            self.collection.delete(where={"document_id": str(document_id)})
+        except Exception as e:
+            logger.error(f"Error removing vectors of unstored document {document_id}: {e}")
+    
+    def get_document(self, document_id) -> Optional[Document]:
         """Get document by ID"""
+        document_id = as_uuid(document_id)
+        if document_id is None:
+            return None
+        
         db = self.get_db_session()
         try:
             return db.query(Document).filter(Document.id == document_id).first()
         finally:
             db.close()
     
+    def get_document_by_hash(self, content_hash: str) -> Optional[Document]:
+        """Get document by content fingerprint"""
+        db = self.get_db_session()
+        try:
+            return db.query(Document).filter(Document.content_hash == content_hash).first()
+        finally:
+            db.close()
+    
+    def get_documents_by_hashes(self, content_hashes: List[str]) -> Dict[str, Document]:
+        """Get documents matching any of the given content fingerprints, keyed by hash"""
+        db = self.get_db_session()
+        try:
+            documents = db.query(Document).filter(Document.content_hash.in_(content_hashes)).all()
+            return {document.content_hash: document for document in documents}
+        finally:
+            db.close()
+    
     def get_all_documents(self) -> List[Document]:
         """Get all documents"""
         db = self.get_db_session()
@@ -158,39 +439,46 @@ class StorageService:
         finally:
             db.close()
     
-    def delete_document(self, document_id: str):
-        """Delete document and all its chunks from both databases"""
-        db = self.get_db_session()
+    def delete_document(self, document_id) -> bool:
+        """
+        Delete document and all its chunks from both databases
         
-        try:
-            # Get all chunk IDs for this document
-            chunks = db.query(Chunk).filter(Chunk.document_id == document_id).all()
-            chunk_ids = [chunk.id for chunk in chunks]
+        Args:
+            document_id: Document ID
             
-            # Delete from PostgreSQL (cascades to chunks)
-            document = db.query(Document).filter(Document.id == document_id).first()
-            if document:
-                db.delete(document)
-                db.commit()
+        Returns:
+            True if the document existed and was deleted
+        """
+        document_id = as_uuid(document_id)
+        if document_id is None:
+            return False
+        
+        try:
+            # One statement: chunks go with it via ON DELETE CASCADE
+            with self.session_scope() as db:
+                result = db.execute(
+                    delete(Document).where(Document.id == document_id).returning(Document.id)
+                )
+                deleted = result.first() is not None
             
-            # Delete from ChromaDB
-            if chunk_ids:
-                self.collection.delete(ids=chunk_ids)
+            # Vectors carry their document ID, so no chunk ID lookup is needed
+            if deleted:
+                self.collection.delete(where={"document_id": str(document_id)})
+                self._bump_generation()
+                logger.info(f"Deleted document {document_id}")
             
-            logger.info(f"Deleted document {document_id} and {len(chunk_ids)} chunks")
+            return deleted
         
         except Exception as e:
-            db.rollback()
             logger.error(f"Error deleting document: {e}")
             raise
-        finally:
-            db.close()
     
     def search_similar_chunks(
         self,
-        query_embedding: List[float],
+        query_embedding: np.ndarray,
         top_k: int = 5,
-        document_id: Optional[str] = None
+        document_id: Optional[str] = None,
+        language: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         Search for similar chunks using vector similarity
@@ -199,21 +487,59 @@ class StorageService:
             query_embedding: Query embedding vector
             top_k: Number of results to return
             document_id: Optional filter by document ID
+            language: Optional filter by document language
             
         Returns:
             Dictionary with results
         """
+        return self.search_similar_chunks_many(
+            [query_embedding],
+            top_k=top_k,
+            document_id=document_id,
+            language=language
+        )
+    
+    def search_similar_chunks_many(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 5,
+        document_id: Optional[str] = None,
+        language: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Search for similar chunks for several query vectors in one call
+        
+        Args:
+            query_embeddings: Query embedding vectors, one row per query
+            top_k: Number of results to return per query
+            document_id: Optional filter by document ID
+            language: Optional filter by document language (ignored until
+                vector_languages_ready; callers then filter the results)
+            
+        Returns:
+            Dictionary with one list of ids and distances per query
+        """
         try:
             # Build where clause for filtering
-            where = None
+            conditions = []
             if document_id:
-                where = {"document_id": document_id}
+                # Vector metadata holds str(uuid); invalid IDs stay as given and match nothing
+                conditions.append({"document_id": str(as_uuid(document_id) or document_id)})
+            if language and self.vector_languages_ready:
+                conditions.append({"language": language})
+            
+            where = None
+            if len(conditions) == 1:
+                where = conditions[0]
+            elif conditions:
+                where = {"$and": conditions}
             
-            # Query ChromaDB
+            # Query ChromaDB (only ids and distances are used; chunk details come from SQL)
             results = self.collection.query(
-                query_embeddings=[query_embedding],
+                query_embeddings=np.asarray(query_embeddings, dtype=np.float32).tolist(),
                 n_results=top_k,
-                where=where
+                where=where,
+                include=["distances"]
             )
             
             return results
@@ -224,8 +550,46 @@ class StorageService:
     
     def get_chunk_details(self, chunk_ids: List[str]) -> List[Chunk]:
         """Get full chunk details from PostgreSQL"""
+        chunk_ids = [as_uuid(chunk_id) for chunk_id in chunk_ids]
         db = self.get_db_session()
         try:
             return db.query(Chunk).filter(Chunk.id.in_(chunk_ids)).all()
         finally:
             db.close()
+    
+    def get_chunks_with_documents(self, chunk_ids: List[str]) -> List[Tuple[Chunk, Document]]:
+        """
+        Get chunks together with their parent documents in one query
+        
+        Args:
+            chunk_ids: Chunk IDs, e.g. in similarity order from the vector search
+            
+        Returns:
+            List of (chunk, document) pairs in the order of chunk_ids;
+            IDs missing from PostgreSQL are skipped
+        """
+        chunk_ids = [as_uuid(chunk_id) for chunk_id in chunk_ids]
+        db = self.get_db_session()
+        try:
+            rows = (
+                db.query(Chunk, Document)
+                .join(Document, Chunk.document_id == Document.id)
+                .filter(Chunk.id.in_(chunk_ids))
+                .all()
+            )
+        finally:
+            db.close()
+        
+        by_id = {chunk.id: (chunk, document) for chunk, document in rows}
+        return [by_id[chunk_id] for chunk_id in chunk_ids if chunk_id in by_id]
+
+
+@lru_cache(maxsize=1)
+def get_shared_storage_service() -> StorageService:
+    """
+    Get the process-wide storage service (one engine pool and Chroma client)
+    
+    Returns:
+        StorageService configured from settings
+    """
+    return StorageService()
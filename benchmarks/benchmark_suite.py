@@ -8,8 +8,16 @@ import sys
 import time
 import json
 import ssl
-from typing import List, Dict, Any
+import hashlib
+import pickle
+from typing import Any, Callable, List, Tuple
 from pathlib import Path
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # Fix SSL certificate issue on macOS
 try:
@@ -24,50 +32,158 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from app.services import (
     DocumentProcessor,
+    Chunk,
     ChunkingService,
-    EmbeddingService,
-    StorageService,
-    RAGService
+    RAGService,
+    SemanticCache,
+    ensure_nltk_data,
+    get_shared_embedding_service,
+    get_shared_storage_service
 )
+from app.config import get_settings
 from loguru import logger
 
 
+# Write buffer for the stdlib JSON report path (orjson writes in one call)
+REPORT_WRITE_BUFFER = 64 * 1024
+
+
 class BenchmarkSuite:
     """Comprehensive benchmark suite for RAG system"""
     
+    EMBEDDING_TEST_TEXTS = [
+        "This is a test sentence.",
+        "Another test sentence for benchmarking.",
+        "Testing multilingual support with English text."
+    ]
+    ARABIC_TEST_TEXT = "مَرْحَباً بِكُمْ فِي نِظَامِ مُعَالَجَةِ الْمُسْتَنَدَاتِ"
+    QUERY_TEST_TEXT = "test query"
+    # Near-duplicates of QUERY_TEST_TEXT, as repeated user queries tend to be
+    SEMANTIC_CACHE_TEST_QUERIES = [
+        "test query",
+        "Test query",
+        "test query?",
+        "a test query",
+        "the test query",
+        "testing query",
+        "test queries",
+        "query test",
+        "test search query",
+        "sample test query"
+    ]
+    
+    # Chunked outputs of the benchmark texts, reused across runs
+    FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+    
     def __init__(self):
+        ensure_nltk_data()
+        
         self.doc_processor = DocumentProcessor()
         self.chunking_service = ChunkingService()
-        self.embedding_service = EmbeddingService()
-        self.storage_service = StorageService()
-        self.rag_service = RAGService()
+        # Shared with the RAG service, so repeated texts hit one embedding cache
+        self.embedding_service = get_shared_embedding_service()
+        # One engine pool and Chroma client for the whole run, closed in __exit__
+        self.storage_service = get_shared_storage_service()
+        self.rag_service = RAGService(
+            storage=self.storage_service,
+            embedding_service=self.embedding_service
+        )
         
         self.results = []
+        
+        self._warmup_ns = 0
+    
+    def __enter__(self) -> "BenchmarkSuite":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Release database connections held for the run"""
+        self.storage_service.close()
     
     def run_all_benchmarks(self):
         """Run all benchmark tests"""
         logger.info("Starting benchmark suite...")
         
-        # Test 1: Document Processing Performance
-        self.test_document_processing()
+        # Pay one-off model initialization outside every timed section
+        _, self._warmup_ns = self._measure(self.embedding_service.warmup)
+        
+        tests = [
+            self.test_document_processing,     # Test 1: Document Processing Performance
+            self.test_chunking_quality,        # Test 2: Chunking Quality
+            self.test_embedding_generation,    # Test 3: Embedding Generation Speed
+            self.test_retrieval_accuracy,      # Test 4: Retrieval Accuracy
+            self.test_arabic_support,          # Test 5: Arabic Language Support
+            self.test_query_performance,       # Test 6: Query Performance
+            self.test_semantic_cache           # Test 7: Semantic Cache Hit Rate
+        ]
         
-        # Test 2: Chunking Quality
-        self.test_chunking_quality()
+        # Run one at a time: concurrent tests would time each other's contention
+        for test in tests:
+            result = test()
+            if result is not None:
+                self.results.append(result)
         
-        # Test 3: Embedding Generation Speed
-        self.test_embedding_generation()
+        # Generate report
+        self.generate_report()
+    
+    def _measure(self, fn: Callable, *args, **kwargs) -> Tuple[Any, int]:
+        """
+        Call a function and time it on the monotonic nanosecond clock
         
-        # Test 4: Retrieval Accuracy
-        self.test_retrieval_accuracy()
+        Returns:
+            Tuple of (return value, elapsed nanoseconds)
+        """
+        start_ns = time.perf_counter_ns()
+        result = fn(*args, **kwargs)
+        return result, time.perf_counter_ns() - start_ns
+    
+    def _get_embeddings(self, texts: List[str]) -> Tuple[np.ndarray, int]:
+        """
+        Encode benchmark texts, timing this call only
         
-        # Test 5: Arabic Language Support
-        self.test_arabic_support()
+        Returns:
+            Tuple of (embedding matrix, nanoseconds per text)
+        """
+        embeddings, elapsed_ns = self._measure(self.embedding_service.generate_embeddings_batch, texts)
+        return embeddings, elapsed_ns // len(texts)
+    
+    def _cached_chunk(self, text: str, strategy: str) -> Tuple[List[Chunk], str]:
+        """
+        Chunk a benchmark text and detect its language, reusing the pickled result of an earlier run
         
-        # Test 6: Query Performance
-        self.test_query_performance()
+        Only the chunk output is cached; timed tests run a live chunking pass
+        instead. Delete the fixtures directory after changing the chunking code.
         
-        # Generate report
-        self.generate_report()
+        Args:
+            text: Text to chunk
+            strategy: Chunking strategy
+            
+        Returns:
+            Tuple of (chunks, detected language)
+        """
+        service = self.chunking_service
+        key = hashlib.sha256(
+            f"scan:{strategy}:{service.default_chunk_size}:{service.default_overlap}:{text}".encode('utf-8')
+        ).hexdigest()
+        fixture_path = self.FIXTURES_DIR / f"{key}.pkl"
+        
+        if fixture_path.exists():
+            try:
+                with open(fixture_path, 'rb') as f:
+                    return pickle.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable chunk fixture {fixture_path.name}: {e}")
+        
+        chunks, language, _ = self.doc_processor.scan_and_chunk(text, service, strategy=strategy)
+        
+        self.FIXTURES_DIR.mkdir(exist_ok=True)
+        with open(fixture_path, 'wb') as f:
+            pickle.dump((chunks, language), f, protocol=pickle.HIGHEST_PROTOCOL)
+        
+        return chunks, language
     
     def test_document_processing(self):
         """Test document processing speed"""
@@ -75,23 +191,27 @@ class BenchmarkSuite:
         
         test_text = "This is a test document. " * 1000
         
-        start_time = time.time()
-        # Simulate processing
-        chunks = self.chunking_service.chunk_text(test_text, strategy='fixed')
-        processing_time = time.time() - start_time
+        # Chunking and language detection in one live, timed pass
+        (chunks, language, _), processing_ns = self._measure(
+            self.doc_processor.scan_and_chunk, test_text, self.chunking_service, strategy='fixed'
+        )
         
-        self.results.append({
+        result = {
             'test_name': 'Document Processing',
             'metric': 'Processing Time',
-            'score': processing_time,
+            'score': processing_ns / 1e9,
+            'score_ns': processing_ns,
             'unit': 'seconds',
             'details': {
                 'text_length': len(test_text),
-                'chunks_created': len(chunks)
+                'chunks_created': len(chunks),
+                'language_detected': language
             }
-        })
+        }
         
-        logger.info(f"✓ Document processing: {processing_time:.3f}s")
+        logger.info(f"✓ Document processing: {processing_ns / 1e9:.6f}s, {len(chunks)} chunks, language={language}")
+        
+        return result
     
     def test_chunking_quality(self):
         """Test chunking strategy quality"""
@@ -109,52 +229,61 @@ class BenchmarkSuite:
         The methodology section explains our approach.
         """
         
-        chunks = self.chunking_service.chunk_text(structured_text, strategy='dynamic')
+        chunks, _ = self._cached_chunk(structured_text, 'dynamic')
         
         # Calculate metrics
-        avg_chunk_size = sum(len(c.text) for c in chunks) / len(chunks) if chunks else 0
+        lens = np.fromiter((len(c.text) for c in chunks), dtype=np.int32, count=len(chunks))
+        avg_chunk_size = float(lens.mean()) if lens.size else 0.0
+        p95_chunk_size = float(np.percentile(lens, 95)) if lens.size else 0.0
         
-        self.results.append({
+        result = {
             'test_name': 'Chunking Quality',
             'metric': 'Average Chunk Size',
             'score': avg_chunk_size,
             'unit': 'characters',
             'details': {
                 'total_chunks': len(chunks),
+                'p95_chunk_size': p95_chunk_size,
                 'strategy': 'dynamic'
             }
-        })
+        }
         
         logger.info(f"✓ Chunking quality: {len(chunks)} chunks, avg size {avg_chunk_size:.0f} chars")
+        
+        return result
     
     def test_embedding_generation(self):
         """Test embedding generation speed"""
         logger.info("Testing embedding generation...")
         
-        test_texts = [
-            "This is a test sentence.",
-            "Another test sentence for benchmarking.",
-            "Testing multilingual support with English text."
-        ]
+        test_texts = self.EMBEDDING_TEST_TEXTS
         
-        start_time = time.time()
-        embeddings = self.embedding_service.generate_embeddings_batch(test_texts)
-        generation_time = time.time() - start_time
+        embeddings, ns_per_text = self._get_embeddings(test_texts)
         
-        time_per_text = generation_time / len(test_texts)
+        # Encode the same texts again; every lookup should now hit the cache
+        hits, misses = self.embedding_service.cache_hits, self.embedding_service.cache_misses
+        _, cached_ns = self._measure(self.embedding_service.generate_embeddings_batch, test_texts)
+        repeat_hits = self.embedding_service.cache_hits - hits
+        repeat_lookups = repeat_hits + self.embedding_service.cache_misses - misses
         
-        self.results.append({
+        result = {
             'test_name': 'Embedding Generation',
             'metric': 'Time per Text',
-            'score': time_per_text,
+            'score': ns_per_text / 1e9,
+            'score_ns': ns_per_text,
             'unit': 'seconds',
             'details': {
                 'total_texts': len(test_texts),
-                'embedding_dimension': len(embeddings[0]) if embeddings else 0
+                'embedding_dimension': embeddings.shape[1] if len(embeddings) else 0,
+                'warmup_ms': self._warmup_ns / 1e6,
+                'cached_time_per_text_ns': cached_ns // len(test_texts),
+                'cache_hit_rate': repeat_hits / repeat_lookups if repeat_lookups else 0.0
             }
-        })
+        }
         
-        logger.info(f"✓ Embedding generation: {time_per_text:.3f}s per text")
+        logger.info(f"✓ Embedding generation: {ns_per_text / 1e9:.6f}s per text")
+        
+        return result
     
     def test_retrieval_accuracy(self):
         """Test retrieval accuracy with known queries"""
@@ -163,7 +292,7 @@ class BenchmarkSuite:
         # This is a simplified test - in production, use labeled test data
         accuracy_score = 0.85  # Placeholder
         
-        self.results.append({
+        result = {
             'test_name': 'Retrieval Accuracy',
             'metric': 'Accuracy Score',
             'score': accuracy_score,
@@ -171,16 +300,18 @@ class BenchmarkSuite:
             'details': {
                 'note': 'Requires labeled test dataset for full evaluation'
             }
-        })
+        }
         
         logger.info(f"✓ Retrieval accuracy: {accuracy_score * 100:.1f}%")
+        
+        return result
     
     def test_arabic_support(self):
         """Test Arabic language support and diacritics"""
         logger.info("Testing Arabic language support...")
         
         # Test Arabic text with diacritics
-        arabic_text = "مَرْحَباً بِكُمْ فِي نِظَامِ مُعَالَجَةِ الْمُسْتَنَدَاتِ"
+        arabic_text = self.ARABIC_TEST_TEXT
         
         # Detect language
         language = self.doc_processor.detect_language(arabic_text)
@@ -189,11 +320,9 @@ class BenchmarkSuite:
         has_diacritics = self.doc_processor.validate_arabic_diacritics(arabic_text)
         
         # Generate embedding
-        start_time = time.time()
-        embedding = self.embedding_service.generate_embedding(arabic_text)
-        arabic_embedding_time = time.time() - start_time
+        _, arabic_embedding_ns = self._get_embeddings([arabic_text])
         
-        self.results.append({
+        result = {
             'test_name': 'Arabic Support',
             'metric': 'Diacritics Preserved',
             'score': 1.0 if has_diacritics else 0.0,
@@ -201,38 +330,101 @@ class BenchmarkSuite:
             'details': {
                 'language_detected': language,
                 'has_diacritics': has_diacritics,
-                'embedding_time': arabic_embedding_time
+                'embedding_time_ns': arabic_embedding_ns,
+                'warmup_ms': self._warmup_ns / 1e6
             }
-        })
+        }
         
         logger.info(f"✓ Arabic support: Language={language}, Diacritics={has_diacritics}")
+        
+        return result
     
     def test_query_performance(self):
         """Test query response time"""
         logger.info("Testing query performance...")
         
         # Simulate query (requires documents in database)
-        query = "test query"
+        query = self.QUERY_TEST_TEXT
         
-        start_time = time.time()
         try:
             # Generate query embedding
-            query_embedding = self.embedding_service.generate_embedding(query)
-            query_time = time.time() - start_time
+            query_embedding, embedding_ns = self._measure(self.embedding_service.generate_embedding, query)
             
-            self.results.append({
+            # Search the vector and SQL stores with it
+            response, search_ns = self._measure(
+                self.rag_service.semantic_search, query, query_embedding=query_embedding
+            )
+            query_ns = embedding_ns + search_ns
+            
+            result = {
                 'test_name': 'Query Performance',
                 'metric': 'Query Time',
-                'score': query_time,
+                'score': query_ns / 1e9,
+                'score_ns': query_ns,
                 'unit': 'seconds',
                 'details': {
-                    'query_length': len(query)
+                    'query_length': len(query),
+                    'embedding_time_ns': embedding_ns,
+                    'search_time_ns': search_ns,
+                    'results_returned': response['total_results']
                 }
-            })
+            }
             
-            logger.info(f"✓ Query performance: {query_time:.3f}s")
+            logger.info(f"✓ Query performance: {query_ns / 1e9:.6f}s")
+            
+            return result
         except Exception as e:
             logger.warning(f"Query test skipped: {e}")
+            return None
+    
+    def test_semantic_cache(self):
+        """Test semantic cache hit rate on paraphrased queries"""
+        logger.info("Testing semantic cache hit rate...")
+        
+        queries = self.SEMANTIC_CACHE_TEST_QUERIES
+        embeddings, _ = self._get_embeddings([self.QUERY_TEST_TEXT] + queries)
+        
+        settings = get_settings()
+        
+        # Same flow as RAGService: look up each query, cache the result on a miss
+        def replay(cache: SemanticCache):
+            for query, embedding in zip(queries, embeddings[1:]):
+                if cache.lookup(embedding) is None:
+                    cache.insert(embedding, {'query': query})
+        
+        hit_rates = {}
+        lookup_ns = 0
+        for threshold in sorted({settings.semantic_cache_threshold, 0.85}):
+            cache = SemanticCache(
+                dimension=embeddings.shape[1],
+                threshold=threshold,
+                capacity=len(embeddings)
+            )
+            cache.insert(embeddings[0], {'query': self.QUERY_TEST_TEXT})
+            
+            _, elapsed_ns = self._measure(replay, cache)
+            lookup_ns += elapsed_ns
+            
+            hit_rates[threshold] = cache.hit_rate()
+        
+        hit_rate = hit_rates[settings.semantic_cache_threshold]
+        
+        result = {
+            'test_name': 'Semantic Cache',
+            'metric': 'Hit Rate',
+            'score': hit_rate,
+            'unit': 'percentage',
+            'details': {
+                'queries': len(queries),
+                'threshold': settings.semantic_cache_threshold,
+                'hit_rate_by_threshold': {str(t): rate for t, rate in hit_rates.items()},
+                'lookup_time_ns': lookup_ns // (len(queries) * len(hit_rates))
+            }
+        }
+        
+        logger.info(f"✓ Semantic cache: {hit_rate * 100:.1f}% hit rate at threshold {settings.semantic_cache_threshold}")
+        
+        return result
     
     def generate_report(self):
         """Generate benchmark report"""
@@ -242,7 +434,11 @@ class BenchmarkSuite:
         
         for result in self.results:
             logger.info(f"\n{result['test_name']}:")
-            logger.info(f"  {result['metric']}: {result['score']:.4f} {result['unit']}")
+            if 'score_ns' in result:
+                ns = result['score_ns']
+                logger.info(f"  {result['metric']}: {ns / 1e9:.6f}s ({ns} ns)")
+            else:
+                logger.info(f"  {result['metric']}: {result['score']:.4f} {result['unit']}")
             if result.get('details'):
                 logger.info(f"  Details: {result['details']}")
         
@@ -251,13 +447,20 @@ class BenchmarkSuite:
         results_dir.mkdir(exist_ok=True)
         
         output_file = results_dir / 'benchmark_results.json'
-        with open(output_file, 'w') as f:
-            json.dump(self.results, f, indent=2, ensure_ascii=False)
+        if orjson is not None:
+            output_file.write_bytes(orjson.dumps(
+                self.results,
+                option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY
+            ))
+        else:
+            # json.dump issues many small writes; a 64 KB buffer batches them
+            with open(output_file, 'w', encoding='utf-8', buffering=REPORT_WRITE_BUFFER) as f:
+                json.dump(self.results, f, indent=2, ensure_ascii=False)
         
         logger.info(f"\n✓ Results saved to: {output_file}")
         logger.info("="*60)
 
 
 if __name__ == "__main__":
-    benchmark = BenchmarkSuite()
-    benchmark.run_all_benchmarks()
+    with BenchmarkSuite() as benchmark:
+        benchmark.run_all_benchmarks()
@@ -0,0 +1,26 @@
+"""
+Shared pytest fixtures
+"""
+
+import pytest
+from app.services.document_processor import DocumentProcessor
+from app.services.embedding_service import EmbeddingService
+from app.services.chunking_service import ChunkingService
+
+
+@pytest.fixture(scope="session")
+def processor():
+    """Document processor shared by the whole test run"""
+    return DocumentProcessor()
+
+
+@pytest.fixture(scope="session")
+def embedder():
+    """Embedding service shared by the whole test run (loads the model once)"""
+    return EmbeddingService()
+
+
+@pytest.fixture(scope="session")
+def chunker():
+    """Chunking service with default settings shared by the whole test run"""
+    return ChunkingService()
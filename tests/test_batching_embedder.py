@@ -0,0 +1,58 @@
+"""
+Tests for dynamic embedding batching
+"""
+
+import asyncio
+import pytest
+from app.services.batching_embedder import BatchingEmbedder
+
+
+class FakeEmbeddingService:
+    """Records batches instead of running a model"""
+    
+    def __init__(self, cached=None):
+        self.batches = []
+        self.cached = cached or {}
+    
+    def get_cached_embedding(self, text):
+        return self.cached.get(text)
+    
+    def generate_embeddings_batch(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_a_batch():
+    """Test concurrent callers are served from one forward pass"""
+    service = FakeEmbeddingService()
+    embedder = BatchingEmbedder(service, max_batch_size=64, max_wait_ms=50)
+    embedder.start()
+    
+    try:
+        single, many = await asyncio.gather(
+            embedder.embed("abc"),
+            embedder.embed_many(["a", "ab"])
+        )
+    finally:
+        await embedder.stop()
+    
+    assert single == [3.0]
+    assert many == [[1.0], [2.0]]
+    assert len(service.batches) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_query_skips_batching():
+    """Test a cached text is returned without queueing a batch"""
+    service = FakeEmbeddingService(cached={"hello": [0.5]})
+    embedder = BatchingEmbedder(service)
+    embedder.start()
+    
+    try:
+        embedding = await embedder.embed("hello")
+    finally:
+        await embedder.stop()
+    
+    assert embedding == [0.5]
+    assert service.batches == []
@@ -0,0 +1,80 @@
+"""
+Micro-benchmarks for the hot paths (pytest-benchmark)
+
+Run with: python -m pytest tests/test_bench.py --benchmark-json=results.json
+"""
+
+import numpy as np
+from app.services.semantic_cache import SemanticCache
+
+
+ARABIC_TEXT = "مَرْحَباً بِكُمْ فِي نِظَامِ مُعَالَجَةِ الْمُسْتَنَدَاتِ"
+DOCUMENT_TEXT = "This is a test document. " * 1000
+STRUCTURED_TEXT = """
+Introduction
+This is the introduction paragraph with important information.
+
+Section 1: Background
+Here we discuss the background of the topic.
+
+Section 2: Methodology
+The methodology section explains our approach.
+"""
+
+
+def test_bench_detect_language(benchmark, processor):
+    """Benchmark language detection on mixed text"""
+    text = DOCUMENT_TEXT + ARABIC_TEXT
+    result = benchmark.pedantic(processor.detect_language, args=(text,), rounds=20, warmup_rounds=3)
+    assert result == 'mixed'
+
+
+def test_bench_validate_diacritics(benchmark, processor):
+    """Benchmark the diacritics check on Arabic text"""
+    result = benchmark.pedantic(
+        processor.validate_arabic_diacritics, args=(ARABIC_TEXT,), rounds=20, warmup_rounds=3
+    )
+    assert result
+
+
+def test_bench_fixed_chunking(benchmark, chunker):
+    """Benchmark fixed-size chunking of a 25 KB document"""
+    chunks = benchmark.pedantic(chunker.fixed_chunking, args=(DOCUMENT_TEXT,), rounds=5, warmup_rounds=1)
+    assert len(chunks) > 0
+
+
+def test_bench_dynamic_chunking(benchmark, chunker):
+    """Benchmark dynamic chunking of structured text"""
+    chunks = benchmark.pedantic(chunker.dynamic_chunking, args=(STRUCTURED_TEXT,), rounds=20, warmup_rounds=3)
+    assert len(chunks) > 0
+
+
+def test_bench_embed_arabic_uncached(benchmark, embedder):
+    """Benchmark an embedding forward pass (cache cleared before every round)"""
+    embedding = benchmark.pedantic(
+        embedder.generate_embedding,
+        args=(ARABIC_TEXT,),
+        setup=embedder.clear_cache,
+        rounds=20,
+        warmup_rounds=3
+    )
+    assert embedding.shape == (embedder.get_embedding_dimension(),)
+
+
+def test_bench_embed_arabic_cached(benchmark, embedder):
+    """Benchmark an embedding served from the cache"""
+    embedder.generate_embedding(ARABIC_TEXT)
+    embedding = benchmark.pedantic(embedder.generate_embedding, args=(ARABIC_TEXT,), rounds=20, warmup_rounds=3)
+    assert embedding.shape == (embedder.get_embedding_dimension(),)
+
+
+def test_bench_semantic_cache_lookup(benchmark):
+    """Benchmark a lookup against a full semantic cache"""
+    rng = np.random.default_rng(0)
+    cache = SemanticCache(dimension=384, capacity=1024)
+    vectors = rng.standard_normal((1024, 384)).astype(np.float32)
+    for i, vector in enumerate(vectors):
+        cache.insert(vector, {'results': [i]}, scope=(5, None))
+    
+    result = benchmark.pedantic(cache.lookup, args=(vectors[0], (5, None)), rounds=20, warmup_rounds=3)
+    assert result == {'results': [0]}
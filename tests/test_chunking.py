@@ -17,10 +17,8 @@ def test_fixed_chunking():
     assert all(chunk.metadata['strategy'] == 'fixed' for chunk in chunks)
 
 
-def test_dynamic_chunking():
+def test_dynamic_chunking(chunker):
     """Test dynamic chunking"""
-    chunker = ChunkingService()
-    
     text = """
     Paragraph one with some content.
     
@@ -33,10 +31,8 @@ def test_dynamic_chunking():
     assert all(chunk.metadata['strategy'] == 'dynamic' for chunk in chunks)
 
 
-def test_strategy_decision():
+def test_strategy_decision(chunker):
     """Test automatic strategy selection"""
-    chunker = ChunkingService()
-    
     # Simple text should use fixed
     simple_text = "Simple text without structure."
     strategy = chunker.decide_strategy(simple_text, {})
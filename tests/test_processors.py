@@ -2,44 +2,98 @@
 Tests for document processor
 """
 
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pytest
-from app.services.document_processor import DocumentProcessor
+from app.services.document_processor import _scan_unicode, _count_words
 
 
-def test_language_detection():
+LANG_CASES = [
+    ("This is an English sentence.", 'english'),
+    ("هذا نص عربي", 'arabic'),
+    ("This is English and هذا عربي", 'mixed'),
+    # Presentation forms (as extracted from some PDFs) count as Arabic, a BOM does not
+    ("\ufee3\ufeae\ufea3\ufe92\ufe8e", 'arabic'),
+    ("\ufeffEnglish", 'english'),
+]
+
+DIACRITICS_CASES = [
+    ("مَرْحَباً", True),
+    ("مرحبا", False),
+]
+
+
+@pytest.mark.parametrize("text,expected", LANG_CASES)
+def test_language_detection(processor, text, expected):
     """Test language detection"""
-    processor = DocumentProcessor()
-    
-    # Test English
-    english_text = "This is an English sentence."
-    assert processor.detect_language(english_text) == 'english'
-    
-    # Test Arabic
-    arabic_text = "هذا نص عربي"
-    assert processor.detect_language(arabic_text) == 'arabic'
-    
-    # Test mixed
-    mixed_text = "This is English and هذا عربي"
-    assert processor.detect_language(mixed_text) == 'mixed'
+    assert processor.detect_language(text) == expected
 
 
-def test_arabic_diacritics():
+@pytest.mark.parametrize("text,expected", DIACRITICS_CASES)
+def test_arabic_diacritics(processor, text, expected):
     """Test Arabic diacritics detection"""
-    processor = DocumentProcessor()
+    assert processor.validate_arabic_diacritics(text) == expected
+
+
+def test_scan_unicode(processor):
+    """Test single-pass scan matches the separate language and diacritics checks"""
+    samples = [text for text, _ in LANG_CASES + DIACRITICS_CASES] + ["English مَرْحَباً", "12345", ""]
+    for text in samples:
+        has_arabic, has_english, has_diacritics = _scan_unicode(text)
+        assert processor._classify_language(has_arabic, has_english) == processor.detect_language(text)
+        assert has_diacritics == processor.validate_arabic_diacritics(text)
+
+
+def test_count_words():
+    """Test windowed word count matches str.split across window boundaries"""
+    long_text = "هذا نص عربي طويل\n\twith English " * 20000
+    
+    for text in ["", "   ", "one", " one  two\nthree ", long_text]:
+        assert _count_words(text) == len(text.split())
+
+
+def test_scan_and_chunk(processor, chunker):
+    """Test fused chunking and detection agrees with scanning the whole text"""
+    text = "This is English text. " * 300 + "هذا نص عربي"
     
-    # Text with diacritics
-    with_diacritics = "مَرْحَباً"
-    assert processor.validate_arabic_diacritics(with_diacritics) == True
+    chunks, language, has_diacritics = processor.scan_and_chunk(text, chunker, strategy='fixed')
     
-    # Text without diacritics
-    without_diacritics = "مرحبا"
-    assert processor.validate_arabic_diacritics(without_diacritics) == False
+    assert len(chunks) > 1
+    assert language == processor.detect_language(text) == 'mixed'
+    assert has_diacritics == False
+    assert chunks[0].metadata['chunk_language'] == 'english'
+    assert chunks[-1].metadata['chunk_language'] == 'mixed'
 
 
-def test_supported_formats():
+def test_supported_formats(processor):
     """Test supported file formats"""
-    processor = DocumentProcessor()
-    
     assert '.pdf' in processor.supported_formats
     assert '.docx' in processor.supported_formats
     assert '.txt' in processor.supported_formats
+
+
+def test_process_files_preserves_order(processor, tmp_path):
+    """Test batch processing returns results in input order"""
+    paths = []
+    for i, content in enumerate(["English text file", "هذا نص عربي", "Another English file"]):
+        path = tmp_path / f"doc_{i}.txt"
+        path.write_text(content, encoding='utf-8')
+        paths.append(str(path))
+    
+    with ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn")) as executor:
+        results = processor.process_files(paths, executor=executor)
+    
+    assert [r['filename'] for r in results] == ['doc_0.txt', 'doc_1.txt', 'doc_2.txt']
+    assert results[1]['language'] == 'arabic'
+
+
+def test_extract_txt_utf8(processor, tmp_path):
+    """Test UTF-8 TXT extraction skips detection and normalizes newlines"""
+    arabic_text = "هذا نص عربي للاختبار\r\nسطر ثاني"
+    
+    utf8_path = tmp_path / "utf8.txt"
+    utf8_path.write_bytes(arabic_text.encode('utf-8'))
+    
+    text, line_count = processor.extract_txt(str(utf8_path))
+    assert text == "هذا نص عربي للاختبار\nسطر ثاني"
+    assert line_count == 2
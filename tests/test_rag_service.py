@@ -0,0 +1,63 @@
+"""
+Tests for RAG service search caching
+"""
+
+import uuid
+from types import SimpleNamespace
+import numpy as np
+from app.services.rag_service import RAGService
+
+
+class FakeStorageService:
+    """Serves one fixed chunk and counts vector searches"""
+    
+    def __init__(self):
+        self.generation = 0
+        self.vector_languages_ready = True
+        self.searches = 0
+        self.chunk = SimpleNamespace(
+            id=uuid.uuid4(), document_id=uuid.uuid4(), chunk_text="نص", chunk_index=0
+        )
+    
+    def search_similar_chunks_many(self, query_embeddings, top_k=5, document_id=None, language=None):
+        self.searches += 1
+        return {
+            'ids': [[str(self.chunk.id)] for _ in query_embeddings],
+            'distances': [[0.1] for _ in query_embeddings]
+        }
+    
+    def get_chunks_with_documents(self, chunk_ids):
+        return [(self.chunk, SimpleNamespace(filename="doc.txt", language="ar"))]
+
+
+class FakeEmbeddingService:
+    """Fixed-dimension stand-in for the model"""
+    
+    def get_embedding_dimension(self):
+        return 4
+
+
+def test_search_cache_invalidated_by_storage_changes():
+    """Test cached results are reused until documents are added or deleted"""
+    storage = FakeStorageService()
+    service = RAGService(storage=storage, embedding_service=FakeEmbeddingService())
+    embedding = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+    
+    service.semantic_search("query", query_embedding=embedding)
+    service.semantic_search("query", query_embedding=embedding)
+    assert storage.searches == 1
+    
+    storage.generation += 1
+    service.semantic_search("query", query_embedding=embedding)
+    assert storage.searches == 2
+
+
+def test_language_post_filter_before_vector_backfill():
+    """Test language filters still apply while stored vectors lack the field"""
+    storage = FakeStorageService()
+    storage.vector_languages_ready = False
+    service = RAGService(storage=storage, embedding_service=FakeEmbeddingService())
+    embedding = np.array([1.0, 0.0, 0.0, 0.0], dtype=np.float32)
+    
+    assert service.semantic_search("query", query_embedding=embedding, language="en")['total_results'] == 0
+    assert service.semantic_search("query", query_embedding=embedding, language="ar")['total_results'] == 1
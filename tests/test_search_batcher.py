@@ -0,0 +1,68 @@
+"""
+Tests for dynamic search batching
+"""
+
+import asyncio
+import threading
+import numpy as np
+import pytest
+from app.services.search_batcher import SearchBatcher
+
+
+class FakeRAGService:
+    """Records batched searches instead of querying the stores"""
+    
+    def __init__(self, release=None):
+        self.calls = []
+        # Searches filtered by language block until this event is set
+        self.release = release
+    
+    def semantic_search_many(self, queries, query_embeddings, top_k=5, document_id=None, language=None):
+        self.calls.append((list(queries), top_k, document_id, language))
+        if language and self.release is not None:
+            self.release.wait(timeout=5)
+        return [{'query': query, 'results': [], 'total_results': 0} for query in queries]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_grouped_by_scope():
+    """Test searches with the same filters share one call and keep their own results"""
+    service = FakeRAGService()
+    batcher = SearchBatcher(service, max_batch_size=32, max_wait_ms=50)
+    batcher.start()
+    
+    embedding = np.zeros(4, dtype=np.float32)
+    try:
+        first, second, filtered = await asyncio.gather(
+            batcher.search("first", embedding),
+            batcher.search("second", embedding),
+            batcher.search("filtered", embedding, language="arabic")
+        )
+    finally:
+        await batcher.stop()
+    
+    assert [first['query'], second['query'], filtered['query']] == ["first", "second", "filtered"]
+    assert sorted(call[0] for call in service.calls) == [["filtered"], ["first", "second"]]
+
+
+@pytest.mark.asyncio
+async def test_slow_search_does_not_block_later_batches():
+    """Test a search still running does not hold up searches queued after it"""
+    release = threading.Event()
+    service = FakeRAGService(release=release)
+    batcher = SearchBatcher(service, max_batch_size=1, max_wait_ms=50)
+    batcher.start()
+    
+    embedding = np.zeros(4, dtype=np.float32)
+    try:
+        slow = asyncio.ensure_future(batcher.search("slow", embedding, language="arabic"))
+        fast = await asyncio.wait_for(batcher.search("fast", embedding), timeout=1)
+        assert not slow.done()
+        
+        release.set()
+        assert (await slow)['query'] == "slow"
+    finally:
+        release.set()
+        await batcher.stop()
+    
+    assert fast['query'] == "fast"
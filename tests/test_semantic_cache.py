@@ -0,0 +1,27 @@
+"""
+Tests for semantic query cache
+"""
+
+from app.services.semantic_cache import SemanticCache
+
+
+def test_semantic_cache_hit():
+    """Test near-duplicate embeddings hit the cache"""
+    cache = SemanticCache(dimension=3, threshold=0.95)
+    
+    cache.insert([1.0, 0.0, 0.0], {'results': ['a']}, scope=(5, None))
+    
+    assert cache.lookup([0.99, 0.05, 0.0], scope=(5, None)) == {'results': ['a']}
+    assert cache.lookup([0.0, 1.0, 0.0], scope=(5, None)) is None
+
+
+def test_semantic_cache_scope_and_eviction():
+    """Test scope isolation and LRU eviction"""
+    cache = SemanticCache(dimension=2, threshold=0.95, capacity=1)
+    
+    cache.insert([1.0, 0.0], {'results': ['a']}, scope=(5, None))
+    assert cache.lookup([1.0, 0.0], scope=(3, None)) is None
+    
+    cache.insert([0.0, 1.0], {'results': ['b']}, scope=(5, None))
+    assert cache.lookup([1.0, 0.0], scope=(5, None)) is None
+    assert cache.lookup([0.0, 1.0], scope=(5, None)) == {'results': ['b']}